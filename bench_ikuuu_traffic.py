@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+iKuuu 流量解析微基准
+用法：python bench_ikuuu_traffic.py [抓取的 /user 页面文件 ...]
+不传文件时使用内置的模拟页面
+"""
+
+import re
+import sys
+import base64
+import timeit
+from urllib.parse import unquote
+
+from ikuuu_checkin import TrafficExtractor
+
+SAMPLE_BODY = """
+<div class="card-stats-title">今日已用
+  <span class="badge"> 1.23GB</span>
+</div>
+{padding}
+<div class="card-header"><h4>剩余流量</h4></div>
+<div class="card-body"><span class="counter">456.78</span> GB</div>
+{padding}
+"""
+
+
+def legacy_decode_base64(s):
+    """旧实现：逐字节拼接 %xx 再 unquote"""
+    try:
+        return base64.b64decode(s).decode('utf-8')
+    except Exception:
+        raw = base64.b64decode(s)
+        percent_encoded = ''.join(['%{:02x}'.format(b) for b in raw])
+        return unquote(percent_encoded)
+
+
+def legacy_extract(html):
+    """旧实现：每次编译正则，剩余流量使用 [\\s\\S]* 回溯"""
+    todayTrafficReg = r"今日已用\n.*\s(\d+\.?\d*)([M|G|K]?B)"
+    restTrafficReg = r"剩余流量[\s\S]*<span class=\"counter\">(\d+\.?\d*)<\/span> ([M|G|K]?B)"
+    base64_match = re.search(r'var originBody = "([^"]+)"', html)
+    decode_data = legacy_decode_base64(base64_match.group(1))
+    traffic_res = re.search(todayTrafficReg, decode_data)
+    rest_res = re.search(restTrafficReg, decode_data)
+    return traffic_res.group(1, 2), rest_res.group(1, 2)
+
+
+def new_extract(extractor, html):
+    body = extractor.extract_origin_body(html)
+    return extractor.parse(extractor.decode_base64(body))
+
+
+def build_sample_page(padding_kb=200, invalid_utf8=False):
+    """构造与 /user 页面结构一致的模拟页面"""
+    padding = '<p class="filler">' + '填充内容 filler ' * (padding_kb * 64) + '</p>'
+    raw = SAMPLE_BODY.format(padding=padding).encode('utf-8')
+    if invalid_utf8:
+        raw += b'\xff\xfe'
+    encoded = base64.b64encode(raw).decode('ascii')
+    return f'<html><script>var originBody = "{encoded}";</script></html>'
+
+
+def bench(name, html, number):
+    extractor = TrafficExtractor()
+    legacy = timeit.timeit(lambda: legacy_extract(html), number=number) / number
+    new = timeit.timeit(lambda: new_extract(extractor, html), number=number) / number
+    result = new_extract(extractor, html)
+    print(f"{name}: {len(html) / 1024:.0f} KiB")
+    print(f"  旧实现: {legacy * 1000:.3f} ms/次")
+    print(f"  新实现: {new * 1000:.3f} ms/次 (x{legacy / new:.1f})")
+    print(f"  结果: {result}")
+
+
+def main():
+    number = 20
+    if len(sys.argv) > 1:
+        for path in sys.argv[1:]:
+            with open(path, 'r', encoding='utf-8') as f:
+                bench(path, f.read(), number)
+    else:
+        bench("模拟页面", build_sample_page(), number)
+        bench("模拟页面（含非法 UTF-8）", build_sample_page(invalid_utf8=True), number)
+
+
+if __name__ == "__main__":
+    main()
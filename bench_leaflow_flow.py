@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Leaflow 签到流程基准
+用法：python bench_leaflow_flow.py [账号数量，默认 3] [场景，逗号分隔，默认全部]
+启动本地测试站点（leaflow_fixture.py），每个场景通过 MultiAccountManager 对 N 个虚拟账号端到端签到并统计耗时
+场景：selenium（纯浏览器）、handoff（浏览器登录后交给 HTTP 签到）、cdp（DevTools 协议引擎）、http（优先纯 HTTP）
+测试站点的延迟、已签到状态和选择器变体通过 FIXTURE_* 环境变量配置，其他签到流程配置（LEAFLOW_*）照常生效
+选择器统计和会话快照写入临时目录，不影响真实运行的 .leaflow_selectors.json / .leaflow_sessions.json
+"""
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+import statistics
+
+from leaflow_fixture import FixtureConfig, LeaflowFixture
+
+# 每个场景覆盖的 leaflow_checkin 模块配置
+SCENARIOS = {
+    'selenium': {'ENGINE': 'selenium', 'HTTP_FIRST': False, 'HANDOFF_AFTER_LOGIN': False},
+    'handoff': {'ENGINE': 'selenium', 'HTTP_FIRST': False, 'HANDOFF_AFTER_LOGIN': True},
+    'cdp': {'ENGINE': 'cdp', 'HTTP_FIRST': False, 'HANDOFF_AFTER_LOGIN': False},
+    'http': {'ENGINE': 'selenium', 'HTTP_FIRST': True, 'HANDOFF_AFTER_LOGIN': False},
+}
+
+
+def check_http_fallback(fixture, leaflow, password):
+    """签到页没有表单、只有脚本中出现“已签到”时，纯 HTTP 流程必须回退而不是报告已签到"""
+    fixture.config.no_form = True
+    fixture.reset()
+    try:
+        try:
+            success, result = leaflow.LeaflowHttpCheckin("fallback@example.com", password).run()
+        except leaflow.HttpFlowFallback as e:
+            print(f"✅ 无表单签到页：HTTP 流程已回退（{e}）")
+        else:
+            raise SystemExit(f"❌ 无表单签到页：HTTP 流程没有回退，而是返回了 {success}, {result}")
+        if fixture.state.counters['checkin']:
+            raise SystemExit("❌ 无表单签到页：HTTP 流程回退前已经提交了签到")
+    finally:
+        fixture.config.no_form = False
+        fixture.reset()
+
+
+def run_scenario(name, fixture, leaflow, count, password, workdir):
+    """用 MultiAccountManager 按场景配置依次处理 N 个账号，返回 [(邮箱, 成功, 结果, 耗时)]"""
+    for attr, value in SCENARIOS[name].items():
+        setattr(leaflow, attr, value)
+    # 每个场景使用全新的站点状态和会话快照，避免上一个场景的登录态和签到记录影响结果
+    fixture.reset()
+    leaflow.SESSION_FILE = os.path.join(workdir, f"sessions-{name}.json")
+    os.environ['LEAFLOW_ACCOUNTS'] = ','.join(f"bench{i + 1}@example.com:{password}" for i in range(count))
+    manager = leaflow.MultiAccountManager()
+
+    browser = leaflow.SharedBrowser() if leaflow.REUSE_BROWSER else None
+    cdp_browser = leaflow.CdpBrowser() if leaflow.ENGINE == 'cdp' and leaflow.REUSE_BROWSER else None
+    timings = []
+    try:
+        for account in manager.accounts:
+            start = time.monotonic()
+            try:
+                success, result = manager.run_account(account, browser, cdp_browser=cdp_browser)
+            except Exception as e:
+                success, result = False, f"处理账号时发生异常: {e}"
+            timings.append((account['email'], success, result, time.monotonic() - start))
+    finally:
+        if browser:
+            browser.quit()
+        if cdp_browser:
+            cdp_browser.quit()
+    return timings
+
+
+def report(name, fixture, timings):
+    print(f"\n场景 {name}: {SCENARIOS[name]}")
+    for email, success, result, elapsed in timings:
+        print(f"  {'✅' if success else '❌'} {email}: {elapsed:.2f} 秒 - {result}")
+    seconds = [elapsed for *_, elapsed in timings]
+    print(f"成功 {sum(1 for _, success, _, _ in timings if success)}/{len(timings)}，总耗时 {sum(seconds):.2f} 秒")
+    print(f"单账号: 平均 {statistics.mean(seconds):.2f} 秒，中位数 {statistics.median(seconds):.2f} 秒，"
+          f"最快 {min(seconds):.2f} 秒，最慢 {max(seconds):.2f} 秒")
+    print(f"服务端计数: 登录 {fixture.state.counters['login']} 次，签到 {fixture.state.counters['checkin']} 次")
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    names = sys.argv[2].split(',') if len(sys.argv) > 2 else list(SCENARIOS)
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        raise SystemExit(f"未知场景: {','.join(unknown)}，可选 {','.join(SCENARIOS)}")
+
+    # 端口为 0 时自动分配，避免与手动启动的测试站点冲突
+    fixture = LeaflowFixture(FixtureConfig(port=int(os.getenv('FIXTURE_PORT', '0')))).start()
+    workdir = tempfile.mkdtemp(prefix='leaflow-bench-')
+    os.environ.update(fixture.environ())
+    os.environ['LEAFLOW_SELECTOR_FILE'] = os.path.join(workdir, 'selectors.json')
+
+    try:
+        # 站点地址和选择器统计文件在导入时读取，必须在设置环境变量之后导入
+        import leaflow_checkin as leaflow
+
+        password = fixture.config.password or 'fixture'
+        check_http_fallback(fixture, leaflow, password)
+        print(f"测试站点: {fixture.config.variant} 变体，页面延迟 {fixture.config.page_delay}s，"
+              f"渲染延迟 {fixture.config.render_delay}s，复用浏览器 {'是' if leaflow.REUSE_BROWSER else '否'}")
+        for name in names:
+            timings = run_scenario(name, fixture, leaflow, count, password, workdir)
+            report(name, fixture, timings)
+        leaflow.driver_resolver.report()
+        leaflow.selector_registry.report()
+        leaflow.selector_registry.save()
+    finally:
+        fixture.stop()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -12,23 +12,304 @@ import requests
 import re
 import json
 import base64
-from urllib.parse import quote, unquote
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import quote, urlsplit
 from io import BytesIO
 
 # 配置日志
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# 并发执行配置：IKUUU_MAX_WORKERS > 1 时启用并发模式
+MAX_WORKERS = int(os.getenv('IKUUU_MAX_WORKERS', '1'))
+# 同一主机两次请求发起之间的最小间隔（秒），仅并发模式使用
+REQUEST_INTERVAL = float(os.getenv('IKUUU_REQUEST_INTERVAL', '1'))
+
+# 会话缓存配置：保存登录后的 Cookie，下次运行直接签到
+SESSION_FILE = os.getenv('IKUUU_SESSION_FILE', '.ikuuu_sessions.json')
+# 会话有效期（秒），默认 7 天
+SESSION_TTL = int(os.getenv('IKUUU_SESSION_TTL', str(7 * 24 * 3600)))
+# 最多缓存的账号数量，超出时淘汰最久未使用的
+SESSION_MAX_ENTRIES = int(os.getenv('IKUUU_SESSION_MAX_ENTRIES', '500'))
+
+# 流式读取 /user 页面，拿到 originBody 后立即断开，设为 0 时下载完整页面
+STREAM_USER_PAGE = os.getenv('IKUUU_STREAM_USER_PAGE', '1') == '1'
+STREAM_CHUNK_SIZE = 8192
+
+# 镜像站点列表（逗号分隔），启动时测速选择最快的可用站点
+# 注意：默认 host 跟 JS 版保持一致
+DEFAULT_BASE_URL = "https://ikuuu.org"
+MIRRORS = [m.strip().rstrip('/') for m in os.getenv('IKUUU_MIRRORS', '').split(',') if m.strip()] or [DEFAULT_BASE_URL]
+# 测速单个站点的超时时间（秒）
+PROBE_TIMEOUT = float(os.getenv('IKUUU_PROBE_TIMEOUT', '5'))
+# 测速结果缓存文件和有效期（秒），有效期内直接复用上次选中的站点
+HOST_CACHE_FILE = os.getenv('IKUUU_HOST_CACHE_FILE', '.ikuuu_host.json')
+HOST_CACHE_TTL = int(os.getenv('IKUUU_HOST_CACHE_TTL', str(24 * 3600)))
+
+class HostRateLimiter:
+    """按主机限制请求发起间隔，多个账号线程共享"""
+
+    def __init__(self, interval):
+        self.interval = max(0.0, interval)
+        self._lock = threading.Lock()
+        self._next_slot = {}
+
+    def wait(self, url):
+        """阻塞到该主机的下一个可用时间点"""
+        if self.interval <= 0:
+            return
+        host = urlsplit(url).netloc
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self.interval
+        delay = slot - now
+        if delay > 0:
+            time.sleep(delay)
+
+class MirrorSelector:
+    """镜像站点测速：并发探测所有站点，选用最先正常响应的一个并缓存到本地"""
+
+    def __init__(self, mirrors, timeout, cache_path, cache_ttl):
+        self.mirrors = mirrors
+        self.timeout = timeout
+        self.cache_path = cache_path
+        self.cache_ttl = cache_ttl
+
+    def select(self):
+        """返回选中的站点地址"""
+        if len(self.mirrors) == 1:
+            return self.mirrors[0]
+        cached = self.load_cache()
+        if cached:
+            logger.info(f"使用缓存的站点: {cached}")
+            return cached
+        host, latency = self.race()
+        if host:
+            logger.info(f"测速选中站点: {host} ({latency * 1000:.0f} ms)")
+            self.save_cache(host, latency)
+            return host
+        logger.warning(f"所有站点测速失败，使用默认站点: {self.mirrors[0]}")
+        return self.mirrors[0]
+
+    def probe(self, url):
+        """探测单个站点，返回响应耗时，不可用时抛出异常"""
+        start = time.monotonic()
+        with requests.get(url, timeout=self.timeout, allow_redirects=False, stream=True) as response:
+            if response.status_code >= 400:
+                raise RuntimeError(f"状态码 {response.status_code}")
+        return time.monotonic() - start
+
+    def race(self):
+        """并发探测，返回最先正常响应的 (站点, 耗时)"""
+        pool = ThreadPoolExecutor(max_workers=len(self.mirrors))
+        futures = {pool.submit(self.probe, url): url for url in self.mirrors}
+        try:
+            for future in as_completed(futures):
+                url = futures[future]
+                try:
+                    return url, future.result()
+                except Exception as e:
+                    logger.warning(f"站点 {url} 测速失败: {e}")
+            return None, None
+        finally:
+            # 不等待较慢的探测结束，它们会在超时后自行退出
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def load_cache(self):
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return None
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                cache = json.load(f)
+        except Exception as e:
+            logger.warning(f"读取站点缓存失败，忽略: {e}")
+            return None
+        host = cache.get('host')
+        if host in self.mirrors and time.time() - cache.get('checked_at', 0) < self.cache_ttl:
+            return host
+        return None
+
+    def save_cache(self, host, latency):
+        if not self.cache_path:
+            return
+        try:
+            with open(self.cache_path, 'w', encoding='utf-8') as f:
+                json.dump({'host': host, 'latency': latency, 'checked_at': time.time()}, f)
+        except Exception as e:
+            logger.warning(f"保存站点缓存失败: {e}")
+
+class SessionStore:
+    """按账号持久化 Cookie 的本地会话缓存，支持过期和淘汰"""
+
+    def __init__(self, path, ttl, max_entries):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._entries = self._load()
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                entries = json.load(f)
+        except Exception as e:
+            logger.warning(f"读取会话缓存失败，忽略: {e}")
+            return {}
+        now = time.time()
+        valid = {k: v for k, v in entries.items() if now - v.get('saved_at', 0) < self.ttl}
+        if len(valid) != len(entries):
+            self._dirty = True
+        return valid
+
+    def get(self, email):
+        """返回未过期的 Cookie 列表，没有则返回 None"""
+        with self._lock:
+            entry = self._entries.get(email)
+            if not entry:
+                return None
+            if time.time() - entry.get('saved_at', 0) >= self.ttl:
+                del self._entries[email]
+                self._dirty = True
+                return None
+            return entry['cookies']
+
+    def put(self, email, cookie_jar):
+        """保存会话 Cookie，超出容量时淘汰最早保存的账号"""
+        cookies = [
+            {
+                'name': c.name,
+                'value': c.value,
+                'domain': c.domain,
+                'path': c.path,
+                'expires': c.expires,
+                'secure': c.secure,
+            }
+            for c in cookie_jar
+        ]
+        with self._lock:
+            self._entries[email] = {'saved_at': time.time(), 'cookies': cookies}
+            if len(self._entries) > self.max_entries:
+                oldest = sorted(self._entries, key=lambda k: self._entries[k]['saved_at'])
+                for key in oldest[:len(self._entries) - self.max_entries]:
+                    del self._entries[key]
+            self._dirty = True
+
+    def discard(self, email):
+        """删除被服务端拒绝的会话"""
+        with self._lock:
+            if self._entries.pop(email, None) is not None:
+                self._dirty = True
+
+    def save(self):
+        """写回磁盘，只在有变化时写入"""
+        with self._lock:
+            if not self._dirty or not self.path:
+                return
+            tmp_path = f"{self.path}.tmp"
+            try:
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(self._entries, f)
+                os.replace(tmp_path, self.path)
+                self._dirty = False
+                logger.info(f"会话缓存已保存: {len(self._entries)} 个账号")
+            except Exception as e:
+                logger.warning(f"保存会话缓存失败: {e}")
+
+class TrafficExtractor:
+    """用户页面流量解析器：预编译正则，单次扫描同时提取今日已用和剩余流量"""
+
+    ORIGIN_BODY_RE = re.compile(r'var originBody = "([^"]+)"')
+    ORIGIN_BODY_PREFIX = b'var originBody = "'
+    # 单次扫描的锚点：两个标题和剩余流量后面的计数器
+    ANCHOR_RE = re.compile(r'今日已用|剩余流量|<span class="counter">')
+    TODAY_RE = re.compile(r'今日已用\n.*\s(\d+\.?\d*)([KMGT]?B)')
+    REST_RE = re.compile(r'<span class="counter">(\d+\.?\d*)</span> ([KMGT]?B)')
+    UNIT_BYTES = {'B': 1, 'KB': 1024, 'MB': 1024 ** 2, 'GB': 1024 ** 3, 'TB': 1024 ** 4}
+
+    @staticmethod
+    def decode_base64(s):
+        """Base64解码，非法 UTF-8 字节按替换字符处理（等价于 JS 的 SlowerDecodeBase64）"""
+        raw = base64.b64decode(s)
+        try:
+            return raw.decode('utf-8')
+        except UnicodeDecodeError:
+            return raw.decode('utf-8', 'replace')
+
+    def extract_origin_body(self, html):
+        """提取页面中 base64 编码的原始 HTML，找不到返回 None"""
+        match = self.ORIGIN_BODY_RE.search(html)
+        return match.group(1) if match else None
+
+    def scan_origin_body(self, chunks):
+        """逐块扫描响应字节流，拿到完整的 originBody 字面量后立即返回，找不到返回 None"""
+        prefix = self.ORIGIN_BODY_PREFIX
+        buffer = bytearray()
+        found = False
+        scan_from = 0
+        for chunk in chunks:
+            if not chunk:
+                continue
+            buffer += chunk
+            if not found:
+                idx = buffer.find(prefix)
+                if idx < 0:
+                    # 只保留可能跨块的前缀尾巴
+                    del buffer[:max(0, len(buffer) - len(prefix) + 1)]
+                    continue
+                del buffer[:idx + len(prefix)]
+                found = True
+            end = buffer.find(b'"', scan_from)
+            if end >= 0:
+                return buffer[:end].decode('latin-1') or None
+            scan_from = len(buffer)
+        return None
+
+    def parse(self, text):
+        """从解码后的页面提取流量，返回包含展示文本和字节数的字典，失败返回 None
+        
+        剩余流量与旧的贪婪正则保持一致：取第一个“剩余流量”之后的最后一个计数器
+        """
+        today = rest = None
+        rest_section = False
+        for anchor in self.ANCHOR_RE.finditer(text):
+            token = anchor.group()
+            if token == '今日已用':
+                if today is None:
+                    today = self.TODAY_RE.match(text, anchor.start())
+            elif token == '剩余流量':
+                rest_section = True
+            elif rest_section:
+                rest = self.REST_RE.match(text, anchor.start()) or rest
+        if not today or not rest:
+            return None
+        return {
+            'today': f"{today.group(1)} {today.group(2)}",
+            'today_bytes': self.to_bytes(today.group(1), today.group(2)),
+            'rest': f"{rest.group(1)} {rest.group(2)}",
+            'rest_bytes': self.to_bytes(rest.group(1), rest.group(2)),
+        }
+
+    def to_bytes(self, value, unit):
+        return int(float(value) * self.UNIT_BYTES[unit])
+
 class IKUUUAutoCheckin:
-    def __init__(self, email, password):
+    traffic_extractor = TrafficExtractor()
+
+    def __init__(self, email, password, rate_limiter=None, session_store=None, base_url=None):
         self.email = email
         self.password = password
+        self.rate_limiter = rate_limiter
+        self.session_store = session_store
         
         if not self.email or not self.password:
             raise ValueError("邮箱和密码不能为空")
         
-        # 注意：host 跟 JS 版保持一致
-        self.base_url = "https://ikuuu.org"
+        self.base_url = base_url or MIRRORS[0]
         self.session = requests.Session()
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/100.0.4992.0 Safari/537.36',
@@ -38,27 +319,23 @@ class IKUUUAutoCheckin:
             'Referer': self.base_url,
             'Origin': self.base_url,
         })
+    
+    def request(self, method, url, **kwargs):
+        """发送请求，并发模式下先经过主机限速"""
+        if self.rate_limiter:
+            self.rate_limiter.wait(url)
+        return self.session.request(method, url, **kwargs)
         
     def decode_base64(self, s):
         """Base64解码，兼容UTF-8编码（仿 JS 逻辑）"""
-        try:
-            # 现代解码方法
-            return base64.b64decode(s).decode('utf-8')
-        except Exception:
-            # 兼容 JS 的 SlowerDecodeBase64
-            try:
-                raw = base64.b64decode(s)
-                percent_encoded = ''.join(['%{:02x}'.format(b) for b in raw])
-                return unquote(percent_encoded)
-            except Exception:
-                return base64.b64decode(s).decode('latin-1')
+        return self.traffic_extractor.decode_base64(s)
     
     def get_cookie(self):
         """登录并获取Cookie，仿 JS 逻辑"""
         logger.info(f"开始登录流程，邮箱: {self.email}")
         
         try:
-            self.session.get(self.base_url, timeout=15)
+            self.request('GET', self.base_url, timeout=15)
         except Exception as e:
             logger.error(f"访问首页失败: {str(e)}")
             return False, None
@@ -70,7 +347,7 @@ class IKUUUAutoCheckin:
         }
         
         try:
-            response = self.session.post(login_url, data=data, timeout=15)
+            response = self.request('POST', login_url, data=data, timeout=15)
             logger.info(f"登录响应状态码: {response.status_code}")
             try:
                 result = response.json()
@@ -99,60 +376,111 @@ class IKUUUAutoCheckin:
             logger.error(msg)
             return False, msg
     
+    def restore_session(self):
+        """从会话缓存恢复 Cookie，成功返回 True"""
+        if not self.session_store:
+            return False
+        cookies = self.session_store.get(self.email)
+        if not cookies:
+            return False
+        for c in cookies:
+            self.session.cookies.set(
+                c['name'], c['value'],
+                domain=c.get('domain'), path=c.get('path', '/'),
+                expires=c.get('expires'), secure=c.get('secure', False),
+            )
+        logger.info("已从缓存恢复会话，尝试跳过登录")
+        return True
+    
+    def save_session(self):
+        """将当前会话 Cookie 写入缓存"""
+        if self.session_store:
+            self.session_store.put(self.email, self.session.cookies)
+    
+    def checkin_with_cached_session(self):
+        """用缓存的会话直接签到，会话被拒绝时返回 None"""
+        checkin_url = f"{self.base_url}/user/checkin"
+        try:
+            response = self.request('POST', checkin_url, timeout=15, allow_redirects=False)
+        except Exception as e:
+            logger.warning(f"缓存会话签到请求异常: {str(e)}")
+            return None
+        logger.info(f"缓存会话签到响应状态码: {response.status_code}")
+        # 未登录时服务端会重定向到登录页或返回非 JSON 内容
+        if response.is_redirect or response.status_code in (401, 403):
+            logger.info("缓存会话已失效，重新登录")
+            return None
+        try:
+            response.json()
+        except Exception:
+            logger.info("缓存会话签到响应不是JSON，重新登录")
+            return None
+        return self.parse_checkin_response(response)
+    
     def checkin(self):
         """执行签到流程"""
         logger.info("开始签到流程")
         checkin_url = f"{self.base_url}/user/checkin"
         try:
-            response = self.session.post(checkin_url, timeout=15)
+            response = self.request('POST', checkin_url, timeout=15)
             logger.info(f"签到响应状态码: {response.status_code}")
-            try:
-                result = response.json()
-                logger.info(f"签到响应JSON: {result}")
-                if result.get('ret') == 1:
-                    message = result.get('msg', '签到成功')
-                    logger.info(f"签到成功: {message}")
-                    return True, message
-                else:
-                    error_msg = result.get('msg', '未知错误')
-                    if '已签到' in error_msg or 'already' in error_msg.lower():
-                        logger.info(f"提示: {error_msg}")
-                        return True, error_msg
-                    else:
-                        logger.error(f"签到失败: {error_msg}")
-                        return False, error_msg
-            except Exception:
-                html_content = response.text
-                if 'already-checkin' in html_content or '已签到' in html_content:
-                    logger.info("提示：已经签到过了")
-                    return True, "今日已签到"
-                else:
-                    logger.error("无法确定签到状态：无法解析响应内容")
-                    return False, "签到异常，无法解析响应"
+            return self.parse_checkin_response(response)
         except Exception as e:
             logger.error(f"签到请求异常: {str(e)}")
             return False, str(e)
     
+    def parse_checkin_response(self, response):
+        """解析签到响应，返回 (成功, 消息)"""
+        try:
+            result = response.json()
+            logger.info(f"签到响应JSON: {result}")
+            if result.get('ret') == 1:
+                message = result.get('msg', '签到成功')
+                logger.info(f"签到成功: {message}")
+                return True, message
+            else:
+                error_msg = result.get('msg', '未知错误')
+                if '已签到' in error_msg or 'already' in error_msg.lower():
+                    logger.info(f"提示: {error_msg}")
+                    return True, error_msg
+                else:
+                    logger.error(f"签到失败: {error_msg}")
+                    return False, error_msg
+        except Exception:
+            html_content = response.text
+            if 'already-checkin' in html_content or '已签到' in html_content:
+                logger.info("提示：已经签到过了")
+                return True, "今日已签到"
+            else:
+                logger.error("无法确定签到状态：无法解析响应内容")
+                return False, "签到异常，无法解析响应"
+    
+    def fetch_origin_body_streaming(self, user_url, headers):
+        """流式获取用户页面，读到 originBody 结束引号即关闭连接"""
+        with self.request('GET', user_url, headers=headers, timeout=15, stream=True) as response:
+            logger.info(f"获取用户页面状态码: {response.status_code}")
+            return self.traffic_extractor.scan_origin_body(
+                response.iter_content(chunk_size=STREAM_CHUNK_SIZE)
+            )
+    
     def get_traffic(self, cookie=None):
         """获取流量信息 - 仿 JS 项目逻辑"""
         logger.info("获取流量信息")
         user_url = f"{self.base_url}/user"
 
-        todayTrafficReg = r"今日已用\n.*\s(\d+\.?\d*)([M|G|K]?B)"
-        restTrafficReg = r"剩余流量[\s\S]*<span class=\"counter\">(\d+\.?\d*)<\/span> ([M|G|K]?B)"
-
         try:
             headers = self.session.headers.copy()
             if cookie:
                 headers['Cookie'] = cookie
 
-            response = self.session.get(user_url, headers=headers, timeout=15)
-            logger.info(f"获取用户页面状态码: {response.status_code}")
-
-            base64_match = re.search(r'var originBody = "([^"]+)"', response.text)
+            if STREAM_USER_PAGE:
+                base64_string = self.fetch_origin_body_streaming(user_url, headers)
+            else:
+                response = self.request('GET', user_url, headers=headers, timeout=15)
+                logger.info(f"获取用户页面状态码: {response.status_code}")
+                base64_string = self.traffic_extractor.extract_origin_body(response.text)
             decode_data = ""
-            if base64_match and base64_match.group(1):
-                base64_string = base64_match.group(1)
+            if base64_string:
                 try:
                     decode_data = self.decode_base64(base64_string)
                 except Exception as e:
@@ -162,22 +490,17 @@ class IKUUUAutoCheckin:
                 logger.error("未找到原始HTML")
                 return False, ["未找到流量数据"]
 
-            traffic_res = re.search(todayTrafficReg, decode_data)
-            rest_res = re.search(restTrafficReg, decode_data)
-
-            if not traffic_res or not rest_res:
+            traffic = self.traffic_extractor.parse(decode_data)
+            if not traffic:
                 logger.error("无法匹配流量信息")
                 return False, ["查询流量失败，请检查正则和用户页面 HTML 结构"]
 
-            today, today_unit = traffic_res.group(1), traffic_res.group(2)
-            rest, rest_unit = rest_res.group(1), rest_res.group(2)
-
-            logger.info(f"今日流量: {today} {today_unit}")
-            logger.info(f"剩余流量: {rest} {rest_unit}")
+            logger.info(f"今日流量: {traffic['today']} ({traffic['today_bytes']} 字节)")
+            logger.info(f"剩余流量: {traffic['rest']} ({traffic['rest_bytes']} 字节)")
 
             return True, [
-                f"今日已用：{today} {today_unit}",
-                f"剩余流量：{rest} {rest_unit}"
+                f"今日已用：{traffic['today']}",
+                f"剩余流量：{traffic['rest']}"
             ]
         except Exception as e:
             logger.error(f"获取流量异常: {str(e)}")
@@ -187,12 +510,22 @@ class IKUUUAutoCheckin:
         """单个账号执行流程"""
         try:
             logger.info(f"开始处理账号: {self.email}")
-            login_success, cookie = self.get_cookie()
-            if not login_success:
-                if isinstance(cookie, str) and "登录失败" in cookie:
-                    return False, cookie, []
-                return False, "登录失败获取Cookie", []
-            checkin_success, checkin_msg = self.checkin()
+            cookie = None
+            checkin_result = None
+            if self.restore_session():
+                checkin_result = self.checkin_with_cached_session()
+                if checkin_result is None:
+                    self.session_store.discard(self.email)
+                    self.session.cookies.clear()
+            if checkin_result is None:
+                login_success, cookie = self.get_cookie()
+                if not login_success:
+                    if isinstance(cookie, str) and "登录失败" in cookie:
+                        return False, cookie, []
+                    return False, "登录失败获取Cookie", []
+                checkin_result = self.checkin()
+            checkin_success, checkin_msg = checkin_result
+            self.save_session()
             traffic_success, traffic_info = self.get_traffic(cookie)
             overall_success = checkin_success and traffic_success
             result_msg = checkin_msg if checkin_success else "签到失败"
@@ -210,6 +543,8 @@ class MultiAccountManager:
         self.accounts = self.load_accounts()
         self.telegram_bot_token = os.getenv('TELEGRAM_BOT_TOKEN', '')
         self.telegram_chat_id = os.getenv('TELEGRAM_CHAT_ID', '')
+        self.session_store = SessionStore(SESSION_FILE, SESSION_TTL, SESSION_MAX_ENTRIES)
+        self.base_url = MIRRORS[0]
     
     def load_accounts(self):
         """从环境变量加载多账号信息，支持冒号分隔多账号"""
@@ -274,35 +609,60 @@ class MultiAccountManager:
         except Exception as e:
             logger.error(f"发送Telegram通知时出错: {e}")
     
-    def run_all(self):
-        """运行所有账号的签到流程"""
-        logger.info(f"开始执行 {len(self.accounts)} 个账号的签到任务")
+    def run_account(self, account, rate_limiter=None):
+        """执行单个账号并返回结果字典"""
+        try:
+            auto_checkin = IKUUUAutoCheckin(
+                account['email'], account['password'], rate_limiter, self.session_store, self.base_url
+            )
+            success, result_msg, traffic_info = auto_checkin.run()
+            return {
+                'email': account['email'],
+                'success': success,
+                'result': result_msg,
+                'traffic': traffic_info
+            }
+        except Exception as e:
+            error_msg = f"处理账号时发生异常: {str(e)}"
+            logger.error(error_msg)
+            return {
+                'email': account['email'],
+                'success': False,
+                'result': error_msg,
+                'traffic': []
+            }
+    
+    def run_sequential(self):
+        """顺序执行，账号之间固定间隔"""
         results = []
         for i, account in enumerate(self.accounts, 1):
             logger.info(f"处理第 {i}/{len(self.accounts)} 个账号")
-            try:
-                auto_checkin = IKUUUAutoCheckin(account['email'], account['password'])
-                success, result_msg, traffic_info = auto_checkin.run()
-                results.append({
-                    'email': account['email'],
-                    'success': success,
-                    'result': result_msg,
-                    'traffic': traffic_info
-                })
-                # 在账号之间添加间隔，避免请求过于频繁
-                if i < len(self.accounts):
-                    wait_time = 8
-                    logger.info(f"等待{wait_time}秒后处理下一个账号...")
-                    time.sleep(wait_time)
-            except Exception as e:
-                error_msg = f"处理账号时发生异常: {str(e)}"
-                logger.error(error_msg)
-                results.append({
-                    'email': account['email'],
-                    'success': False,
-                    'result': error_msg,
-                    'traffic': []
-                })
+            results.append(self.run_account(account))
+            # 在账号之间添加间隔，避免请求过于频繁
+            if i < len(self.accounts):
+                wait_time = 8
+                logger.info(f"等待{wait_time}秒后处理下一个账号...")
+                time.sleep(wait_time)
+        return results
+    
+    def run_concurrent(self, max_workers):
+        """并发执行，按主机限制请求间隔，结果保持账号顺序"""
+        logger.info(f"并发执行，最大 {max_workers} 个线程，同主机请求间隔 {REQUEST_INTERVAL} 秒")
+        rate_limiter = HostRateLimiter(REQUEST_INTERVAL)
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            futures = [pool.submit(self.run_account, account, rate_limiter) for account in self.accounts]
+            return [future.result() for future in futures]
+    
+    def run_all(self):
+        """运行所有账号的签到流程"""
+        logger.info(f"开始执行 {len(self.accounts)} 个账号的签到任务")
+        self.base_url = MirrorSelector(MIRRORS, PROBE_TIMEOUT, HOST_CACHE_FILE, HOST_CACHE_TTL).select()
+        max_workers = min(MAX_WORKERS, len(self.accounts))
+        if max_workers > 1:
+            results = self.run_concurrent(max_workers)
+        else:
+            results = self.run_sequential()
+        self.session_store.save()
         self.print_results(results)
         self.send_telegram_notification(results)
         success_count = sum(1 for r in results if r['success'])
@@ -6,65 +6,1007 @@ Leaflow 多账号自动签到脚本
 """
 
 import os
+import sys
+import json
 import time
+import queue
 import logging
+import shutil
+import tempfile
+import re
+import threading
+import subprocess
+from contextlib import contextmanager, nullcontext
+from html.parser import HTMLParser
+from urllib.parse import urljoin, unquote, urlsplit
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.action_chains import ActionChains
+from selenium.webdriver.chrome.service import Service
+from selenium.webdriver.common.actions.action_builder import ActionBuilder
+from selenium.common.exceptions import StaleElementReferenceException, TimeoutException, WebDriverException
 import requests
 
 # 配置日志
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# 多个账号复用同一个浏览器，设为 0 时每个账号单独启动 Chrome
+REUSE_BROWSER = os.getenv('LEAFLOW_REUSE_BROWSER', '1') == '1'
+# 复用模式下每处理多少个账号重启一次浏览器
+BROWSER_RESTART_EVERY = int(os.getenv('LEAFLOW_BROWSER_RESTART_EVERY', '10'))
+# 站点地址，可覆盖为本地测试站点（见 leaflow_fixture.py）
+LEAFLOW_BASE_URL = os.getenv('LEAFLOW_BASE_URL', "https://leaflow.net").rstrip('/')
+LOGIN_URL = os.getenv('LEAFLOW_LOGIN_URL', f"{LEAFLOW_BASE_URL}/login")
+CHECKIN_URL = os.getenv('LEAFLOW_CHECKIN_URL', "https://checkin.leaflow.net")
+# 切换账号时需要清理存储的站点
+LEAFLOW_ORIGINS = [LEAFLOW_BASE_URL, "{0.scheme}://{0.netloc}".format(urlsplit(CHECKIN_URL))]
+# 会话快照保存该域名及其子域名的 Cookie
+COOKIE_DOMAIN = urlsplit(LEAFLOW_BASE_URL).hostname
+
+# 优先使用纯 HTTP 流程签到，遇到验证挑战或意外响应时回退到浏览器 1=开启 0=关闭（默认）
+HTTP_FIRST = os.getenv('LEAFLOW_HTTP_FIRST', '0') == '1'
+# 浏览器登录成功后把 Cookie 交给 requests，签到改走 HTTP（结果会再打开签到页确认）1=开启 0=关闭（默认）
+HANDOFF_AFTER_LOGIN = os.getenv('LEAFLOW_HANDOFF', '0') == '1'
+HTTP_USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+# 页面中出现这些标记说明遇到了人机验证
+CHALLENGE_MARKERS = ["Just a moment", "cf-challenge", "challenge-platform", "cf-turnstile", "h-captcha", "g-recaptcha"]
+# HTTP 签到响应的判定：先找失败标记，再要求出现明确的成功关键词，都不满足时回退到浏览器
+HTTP_FAILURE_MARKERS = ["失败", "错误", "异常", "请先登录", "未登录", "无效", "过期", "error", "fail"]
+HTTP_SUCCESS_KEYWORDS = ["签到成功", "已签到", "已经签到"]
+# HTML 响应只认这些提示元素（class 含其一或 role=alert）中的文本，页面上的普通文字不算结果
+HTTP_MESSAGE_CLASSES = ["alert", "flash", "toast", "message", "notification", "notice"]
+
+# 通过 DevTools 拦截与登录/签到无关的资源 1=开启 0=关闭
+BLOCK_RESOURCES = os.getenv('LEAFLOW_BLOCK_RESOURCES', '1') == '1'
+# 拦截的资源类型（逗号分隔）：image, font, media, stylesheet
+BLOCK_TYPES = [t.strip() for t in os.getenv('LEAFLOW_BLOCK_TYPES', 'image,font,media').split(',') if t.strip()]
+# 额外拦截的 URL 模式（逗号分隔，支持 * 通配），默认拦截常见统计脚本
+BLOCK_URLS = [u.strip() for u in os.getenv(
+    'LEAFLOW_BLOCK_URLS',
+    '*google-analytics.com*,*googletagmanager.com*,*doubleclick.net*,*hm.baidu.com*,*clarity.ms*,*cloudflareinsights.com*'
+).split(',') if u.strip()]
+# 资源类型对应的 URL 模式，Network.setBlockedURLs 只支持按 URL 拦截
+RESOURCE_TYPE_PATTERNS = {
+    'image': ['*.png*', '*.jpg*', '*.jpeg*', '*.gif*', '*.webp*', '*.svg*', '*.ico*', '*.avif*'],
+    'font': ['*.woff*', '*.ttf*', '*.otf*', '*.eot*'],
+    'media': ['*.mp4*', '*.webm*', '*.mp3*', '*.ogg*', '*.m3u8*'],
+    'stylesheet': ['*.css*'],
+}
+
+# 浏览器引擎：selenium=通过 chromedriver 控制，cdp=直接通过 DevTools 协议 websocket 控制 Chrome
+ENGINE = os.getenv('LEAFLOW_ENGINE', 'selenium').strip().lower()
+# Chrome 可执行文件，为空时在 PATH 中查找
+CHROME_BINARY = os.getenv('LEAFLOW_CHROME_BINARY', '')
+CHROME_NAMES = ['google-chrome', 'google-chrome-stable', 'chromium', 'chromium-browser', 'chrome']
+# chromedriver 可执行文件，为空时在 PATH 中查找，版本不匹配时交给 Selenium Manager
+CHROMEDRIVER_BINARY = os.getenv('LEAFLOW_CHROMEDRIVER', '')
+# Chrome/chromedriver 路径和版本缓存，避免每次启动都运行 Selenium Manager
+DRIVER_CACHE_FILE = os.getenv('LEAFLOW_DRIVER_CACHE', '.leaflow_driver.json')
+
+# 并行执行的浏览器数量，1 为顺序执行，auto 按内存和 CPU 自动计算
+WORKERS = os.getenv('LEAFLOW_WORKERS', '1').strip().lower()
+# 所有浏览器进程树的内存上限（MB），默认取启动时可用内存的 80%
+MEMORY_LIMIT_MB = os.getenv('LEAFLOW_MEMORY_LIMIT_MB', '')
+# 还没有实测数据时，单个浏览器（chromedriver + Chrome）的内存估算（MB）
+BROWSER_MEMORY_MB = int(os.getenv('LEAFLOW_BROWSER_MEMORY_MB', '500'))
+
+# 选择器命中统计文件，下次运行优先尝试上次命中的选择器
+SELECTOR_STATS_FILE = os.getenv('LEAFLOW_SELECTOR_FILE', '.leaflow_selectors.json')
+
+# 每个账号的浏览器会话快照（Cookie + localStorage），有效时跳过登录直接签到
+SESSION_FILE = os.getenv('LEAFLOW_SESSION_FILE', '.leaflow_sessions.json')
+# 会话快照有效期（秒），默认 7 天
+SESSION_TTL = int(os.getenv('LEAFLOW_SESSION_TTL', str(7 * 24 * 3600)))
+# Network.setCookies 接受的 Cookie 字段
+COOKIE_PARAM_KEYS = ('name', 'value', 'domain', 'path', 'secure', 'httpOnly', 'sameSite', 'expires')
+
+# 候选选择器按特异性分层：[[最具体的...], [次一级...], ...]
+# 第 i 层（从 0 开始）在等待开始 i * TIER_GRACE 秒后才参与匹配，同一轮检查中靠前的层优先，避免通用选择器抢先命中
+TIER_GRACE = float(os.getenv('LEAFLOW_TIER_GRACE', '2'))
+
+# 签到页面特征元素，用于判断签到页面是否加载完成
+CHECKIN_INDICATORS = [
+    ["button.checkin-btn"],  # 优先使用这个选择器
+    [
+        "//button[contains(text(), '立即签到')]",
+        "//button[contains(text(), '已签到')]",
+        "//*[contains(text(), '每日签到')]",
+    ],
+    ["//*[contains(text(), '签到')]"],
+]
+
+# WebDriver 命令耗时分析结果输出文件，为空时不启用
+PROFILE_FILE = os.getenv('LEAFLOW_PROFILE_FILE', '')
+
+# 登录页面各元素的候选选择器（分层，见 TIER_GRACE）
+EMAIL_SELECTORS = [
+    [
+        "input[type='email']",
+        "input[name='email']",
+        "input[placeholder*='邮箱']",
+        "input[placeholder*='邮件']",
+        "input[placeholder*='email']",
+    ],
+    ["input[name='username']", "input[type='text']"],
+]
+PASSWORD_SELECTORS = [["input[type='password']"]]
+LOGIN_BUTTON_SELECTORS = [
+    ["//button[contains(text(), '登录')]", "//button[contains(text(), 'Login')]"],
+    ["//button[@type='submit']", "//input[@type='submit']", "button[type='submit']"],
+]
+LOGIN_ERROR_SELECTORS = [".error", ".alert-danger", "[class*='error']", "[class*='danger']"]
+
+# 签到按钮的候选选择器（分层），不使用 button[type='submit'] 这类通用选择器，避免点错按钮
+CHECKIN_BUTTON_SELECTORS = [
+    ["button.checkin-btn"],
+    [
+        "//button[contains(text(), '立即签到')]",
+        "//button[contains(text(), '已签到')]",
+        "//button[contains(@class, 'checkin')]",
+        "button[name='checkin']",
+    ],
+]
+# 签到结果提示的候选选择器
+RESULT_SELECTORS = [
+    ".alert-success",
+    ".success",
+    ".message",
+    "[class*='success']",
+    "[class*='message']",
+    ".modal-content",  # 弹窗内容
+    ".ant-message",    # Ant Design 消息
+    ".el-message",     # Element UI 消息
+    ".toast",          # Toast消息
+    ".notification"    # 通知
+]
+# 没有找到结果提示时，从页面文本中提取包含这些关键词的行
+RESULT_KEYWORDS = ["成功", "签到", "获得", "恭喜", "谢谢", "感谢", "完成", "已签到", "连续签到"]
+
+# 各类条件等待的超时时间（秒），可用 LEAFLOW_WAIT_<名称大写> 覆盖
+WAIT_TIMEOUTS = {
+    'page_ready': 20,    # document.readyState == complete
+    'network_idle': 10,  # 一段时间内没有新的资源请求
+    'popup': 3,          # 初始弹窗出现
+    'element': 10,       # 元素出现/可点击
+    'url_change': 20,    # 登录后跳转
+    'toast': 10,         # 签到结果提示
+}
+# 网络空闲判定：资源请求数量保持不变的时长（秒）
+NETWORK_IDLE_TIME = 0.5
+# 固定等待的倍率，默认 0 即不再固定等待；网站行为异常时可设为 1 恢复原来的等待时长
+FALLBACK_SLEEP_SCALE = float(os.getenv('LEAFLOW_FALLBACK_SLEEP_SCALE', '0'))
+
+def eligible_selectors(tiers, elapsed):
+    """返回等待了 elapsed 秒时可以参与匹配的选择器，按层的先后展开"""
+    return [selector for level, tier in enumerate(tiers) if elapsed >= level * TIER_GRACE for selector in tier]
+
+def wait_timeout(name):
+    """读取某类等待的超时时间"""
+    return float(os.getenv(f'LEAFLOW_WAIT_{name.upper()}', WAIT_TIMEOUTS[name]))
+
+def fallback_sleep(seconds):
+    """可配置的兜底固定等待"""
+    if FALLBACK_SLEEP_SCALE > 0:
+        with CommandProfiler.measure_current('sleep', f'fallback_sleep({seconds})'):
+            time.sleep(seconds * FALLBACK_SLEEP_SCALE)
+
+# 隐藏 navigator.webdriver 标记
+HIDE_WEBDRIVER_SCRIPT = "Object.defineProperty(navigator, 'webdriver', {get: () => undefined})"
+
+def chrome_arguments():
+    """Selenium 和 CDP 引擎共用的 Chrome 启动参数"""
+    arguments = []
+    
+    # GitHub Actions环境配置
+    if os.getenv('GITHUB_ACTIONS'):
+        arguments += ['--headless', '--no-sandbox', '--disable-dev-shm-usage', '--disable-gpu', '--window-size=1920,1080']
+    
+    # 通用配置
+    arguments.append('--disable-blink-features=AutomationControlled')
+    return arguments
+
+def create_driver():
+    """按统一配置启动 Chrome"""
+    chrome_options = Options()
+    for argument in chrome_arguments():
+        chrome_options.add_argument(argument)
+    chrome_options.add_experimental_option("excludeSwitches", ["enable-automation"])
+    chrome_options.add_experimental_option('useAutomationExtension', False)
+    if BLOCK_RESOURCES and 'image' in BLOCK_TYPES:
+        # 没有扩展名的图片 URL 也一并禁用
+        chrome_options.add_experimental_option('prefs', {'profile.managed_default_content_settings.images': 2})
+    
+    # 启动耗时包含解析 Chrome/chromedriver 的时间，才能看出缓存省下的部分
+    start = time.monotonic()
+    try:
+        chrome_path, driver_path, source = driver_resolver.resolve()
+    except Exception as e:
+        logger.warning(f"解析 Chrome/chromedriver 失败，交给 Selenium 自动查找: {e}")
+        chrome_path, driver_path, source = None, None, 'selenium'
+    if chrome_path:
+        chrome_options.binary_location = chrome_path
+    
+    driver = None
+    if driver_path:
+        try:
+            driver = webdriver.Chrome(options=chrome_options, service=Service(executable_path=driver_path))
+        except WebDriverException as e:
+            logger.warning(f"使用缓存的 chromedriver 启动失败，交给 Selenium 自动查找: {e}")
+            driver_resolver.invalidate()
+            source = 'selenium'
+    if driver is None:
+        driver = webdriver.Chrome(options=chrome_options)
+    driver_resolver.record_launch(source, time.monotonic() - start)
+    # 对之后打开的每个页面都生效，复用浏览器时也不会丢失
+    driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {"source": HIDE_WEBDRIVER_SCRIPT})
+    if BLOCK_RESOURCES:
+        apply_resource_blocking(driver)
+    return driver
+
+def blocked_url_patterns():
+    """配置的拦截 URL 模式，包括资源类型对应的模式"""
+    patterns = list(BLOCK_URLS)
+    for resource_type in BLOCK_TYPES:
+        patterns.extend(RESOURCE_TYPE_PATTERNS.get(resource_type, []))
+    return patterns
+
+def apply_resource_blocking(driver):
+    """通过 DevTools 拦截配置的资源类型和 URL 模式"""
+    patterns = blocked_url_patterns()
+    if not patterns:
+        return
+    try:
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": patterns})
+        logger.info(f"已拦截资源类型 {BLOCK_TYPES}，URL 模式 {len(patterns)} 条")
+    except WebDriverException as e:
+        logger.warning(f"设置资源拦截失败，忽略: {e}")
+
+def read_meminfo():
+    """读取 /proc/meminfo，返回 (总内存, 可用内存)，单位 MB，非 Linux 返回 (None, None)"""
+    try:
+        info = {}
+        with open('/proc/meminfo', 'r') as f:
+            for line in f:
+                key, value = line.split(':', 1)
+                info[key] = int(value.split()[0]) // 1024
+        return info.get('MemTotal'), info.get('MemAvailable')
+    except (OSError, ValueError):
+        return None, None
+
+def process_tree_rss(pid):
+    """统计进程及其所有子进程的 RSS（MB），读取 /proc，非 Linux 返回 0"""
+    children = {}
+    try:
+        for entry in os.listdir('/proc'):
+            if not entry.isdigit():
+                continue
+            try:
+                with open(f'/proc/{entry}/stat', 'r') as f:
+                    # 进程名可能包含空格，从最后一个右括号之后解析
+                    fields = f.read().rsplit(')', 1)[1].split()
+                children.setdefault(int(fields[1]), []).append(int(entry))
+            except (OSError, IndexError, ValueError):
+                continue
+    except OSError:
+        return 0
+    total_kb = 0
+    stack = [pid]
+    while stack:
+        current = stack.pop()
+        try:
+            with open(f'/proc/{current}/status', 'r') as f:
+                for line in f:
+                    if line.startswith('VmRSS:'):
+                        total_kb += int(line.split()[1])
+                        break
+        except (OSError, ValueError):
+            pass
+        stack.extend(children.get(current, []))
+    return total_kb // 1024
+
+class DriverResolver:
+    """定位并校验 Chrome/chromedriver，结果缓存到磁盘，之后的启动直接使用显式的 Service
+    
+    缓存按文件路径、大小和修改时间校验，浏览器或驱动升级后自动重新解析。
+    """
+    
+    VERSION_RE = re.compile(r'(\d+)\.\d+\.\d+(?:\.\d+)?')
+    
+    def __init__(self, path):
+        self.path = path
+        self.resolved = None
+        # 每次启动的 (来源, 耗时)：discovered=本次解析，disk=磁盘缓存，memory=进程内复用，selenium=交给 Selenium
+        self.launches = []
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def fingerprint(path):
+        stat = os.stat(path)
+        return [stat.st_size, int(stat.st_mtime)]
+    
+    def version(self, path):
+        """运行 --version 读取版本号"""
+        output = subprocess.run([path, '--version'], capture_output=True, text=True, timeout=15).stdout
+        match = self.VERSION_RE.search(output)
+        if not match:
+            raise RuntimeError(f"无法识别版本: {path}")
+        return match.group(0)
+    
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return None
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                cached = json.load(f)
+            for name in ('chrome', 'chromedriver'):
+                entry = cached[name]
+                if self.fingerprint(entry['path']) != entry['fingerprint']:
+                    return None
+            if CHROME_BINARY and cached['chrome']['path'] != CHROME_BINARY:
+                return None
+            if CHROMEDRIVER_BINARY and cached['chromedriver']['path'] != CHROMEDRIVER_BINARY:
+                return None
+            return cached
+        except Exception as e:
+            logger.debug(f"驱动缓存无效，重新解析: {e}")
+            return None
+    
+    def _discover(self):
+        """查找 Chrome 和主版本一致的 chromedriver，PATH 中没有合适的驱动时调用 Selenium Manager"""
+        chrome = CHROME_BINARY or next(filter(None, map(shutil.which, CHROME_NAMES)), None)
+        driver = CHROMEDRIVER_BINARY or shutil.which('chromedriver')
+        chrome_version = self.version(chrome) if chrome else None
+        driver_version = self.version(driver) if driver else None
+        
+        mismatched = chrome_version and driver_version and driver_version.split('.')[0] != chrome_version.split('.')[0]
+        if not driver or (mismatched and not CHROMEDRIVER_BINARY):
+            from selenium.webdriver.common.selenium_manager import SeleniumManager
+            options = Options()
+            if chrome:
+                options.binary_location = chrome
+            driver = SeleniumManager().driver_location(options)
+            driver_version = self.version(driver)
+            # Selenium Manager 可能下载了浏览器并写回 binary_location
+            if not chrome and options.binary_location:
+                chrome = options.binary_location
+                chrome_version = self.version(chrome)
+        if not chrome:
+            raise RuntimeError("找不到 Chrome 可执行文件")
+        
+        return {
+            'chrome': {'path': chrome, 'version': chrome_version, 'fingerprint': self.fingerprint(chrome)},
+            'chromedriver': {'path': driver, 'version': driver_version, 'fingerprint': self.fingerprint(driver)},
+        }
+    
+    def _save(self, resolved):
+        if not self.path:
+            return
+        try:
+            with open(self.path, 'w', encoding='utf-8') as f:
+                json.dump(resolved, f, ensure_ascii=False, indent=2)
+        except Exception as e:
+            logger.warning(f"保存驱动缓存失败: {e}")
+    
+    def resolve(self):
+        """返回 (Chrome 路径, chromedriver 路径, 来源)"""
+        with self._lock:
+            source = 'memory'
+            if self.resolved is None:
+                start = time.monotonic()
+                self.resolved = self._load()
+                source = 'disk'
+                if self.resolved is None:
+                    self.resolved = self._discover()
+                    self._save(self.resolved)
+                    source = 'discovered'
+                logger.info(
+                    f"Chrome {self.resolved['chrome']['version']} / chromedriver {self.resolved['chromedriver']['version']}"
+                    f"（{'重新解析' if source == 'discovered' else '使用缓存'}，耗时 {time.monotonic() - start:.2f} 秒）"
+                )
+            return self.resolved['chrome']['path'], self.resolved['chromedriver']['path'], source
+    
+    def invalidate(self):
+        """缓存的路径启动失败时丢弃，下次重新解析"""
+        with self._lock:
+            self.resolved = None
+            if self.path and os.path.exists(self.path):
+                os.remove(self.path)
+    
+    def record_launch(self, source, seconds):
+        with self._lock:
+            self.launches.append((source, seconds))
+        logger.info(f"浏览器启动耗时 {seconds:.2f} 秒（{source}）")
+    
+    # 启动耗时汇总中各解析来源的说明
+    SOURCE_LABELS = {
+        'discovered': '重新解析',
+        'disk': '磁盘缓存',
+        'memory': '进程内缓存',
+        'selenium': '交给 Selenium 解析',
+    }
+    
+    def report(self):
+        """按解析来源分组输出浏览器启动耗时，对比重新解析和命中缓存的差距"""
+        with self._lock:
+            launches = list(self.launches)
+        groups = {}
+        for source, seconds in launches:
+            groups.setdefault(source, []).append(seconds)
+        for source, group in groups.items():
+            average = sum(group) / len(group)
+            label = self.SOURCE_LABELS.get(source, source)
+            logger.info(f"浏览器启动（{label}）: {len(group)} 次，平均 {average:.2f} 秒")
+
+driver_resolver = DriverResolver(DRIVER_CACHE_FILE)
+
+class SharedBrowser:
+    """多个账号共用的 Chrome 实例，账号之间清理状态，崩溃或达到次数后重启
+    
+    传入 governor 时，每次启动（包括崩溃后和清理失败后的重启）都先经过 MemoryGovernor.admit。
+    """
+    
+    def __init__(self, restart_every=BROWSER_RESTART_EVERY, governor=None):
+        self.restart_every = max(1, restart_every)
+        self.governor = governor
+        self.driver = None
+        self.uses = 0
+    
+    def acquire(self):
+        """返回一个状态干净的 driver"""
+        if self.driver is not None and (self.uses >= self.restart_every or not self.is_alive()):
+            logger.info("重启浏览器...")
+            self.quit()
+        if self.driver is None:
+            self.launch()
+        else:
+            self.reset()
+        self.uses += 1
+        return self.driver
+    
+    def launch(self):
+        with self.governor.admit() if self.governor else nullcontext():
+            self.driver = create_driver()
+        self.uses = 0
+    
+    def needs_launch(self):
+        """下一次 acquire 是否会启动新的浏览器"""
+        return self.driver is None or self.uses >= self.restart_every
+    
+    def running(self):
+        return self.driver is not None
+    
+    def rss_mb(self):
+        """当前 chromedriver 及 Chrome 进程树的内存占用（MB）"""
+        try:
+            return process_tree_rss(self.driver.service.process.pid)
+        except Exception:
+            return 0
+    
+    def is_alive(self):
+        try:
+            self.driver.current_url
+            return True
+        except WebDriverException:
+            return False
+    
+    def reset(self):
+        """清除上一个账号的 Cookie 和站点存储"""
+        try:
+            self.driver.get("about:blank")
+            self.driver.execute_cdp_cmd("Network.clearBrowserCookies", {})
+            for origin in LEAFLOW_ORIGINS:
+                self.driver.execute_cdp_cmd("Storage.clearDataForOrigin", {
+                    "origin": origin,
+                    "storageTypes": "all",
+                })
+        except WebDriverException as e:
+            logger.warning(f"清理浏览器状态失败，重启浏览器: {e}")
+            self.quit()
+            self.launch()
+    
+    def quit(self):
+        if self.driver is not None:
+            try:
+                self.driver.quit()
+            except Exception:
+                pass
+            self.driver = None
+            if self.governor:
+                self.governor.released()
+
+class SessionStore:
+    """按邮箱持久化浏览器 Cookie 和 localStorage 的本地会话快照"""
+    
+    def __init__(self, path, ttl):
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._entries = self._load()
+    
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                entries = json.load(f)
+        except Exception as e:
+            logger.warning(f"读取会话快照失败，忽略: {e}")
+            return {}
+        now = time.time()
+        valid = {k: v for k, v in entries.items() if now - v.get('saved_at', 0) < self.ttl}
+        self._dirty = len(valid) != len(entries)
+        return valid
+    
+    def get(self, email):
+        """返回未过期的快照 {cookies, local_storage}，没有则返回 None"""
+        with self._lock:
+            entry = self._entries.get(email)
+            if entry and time.time() - entry.get('saved_at', 0) < self.ttl:
+                return entry
+            return None
+    
+    def put(self, email, cookies, local_storage):
+        with self._lock:
+            self._entries[email] = {'saved_at': time.time(), 'cookies': cookies, 'local_storage': local_storage}
+            self._dirty = True
+    
+    def discard(self, email):
+        with self._lock:
+            if self._entries.pop(email, None) is not None:
+                self._dirty = True
+    
+    def save(self):
+        """有变化时写回磁盘"""
+        with self._lock:
+            if not self._dirty or not self.path:
+                return
+            tmp_path = f"{self.path}.tmp"
+            try:
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(self._entries, f)
+                os.replace(tmp_path, self.path)
+                self._dirty = False
+                logger.info(f"会话快照已保存: {len(self._entries)} 个账号")
+            except Exception as e:
+                logger.warning(f"保存会话快照失败: {e}")
+
+class any_of_visible:
+    """组合等待条件：一次轮询按层检查候选选择器，任一元素可见（可点击）即返回 (选择器, 元素)
+    
+    通用的层要等更具体的层有 TIER_GRACE 秒机会出现后才参与匹配。
+    """
+    
+    def __init__(self, tiers, clickable=False):
+        self.tiers = tiers
+        self.clickable = clickable
+        self.started = None
+    
+    def __call__(self, driver):
+        if self.started is None:
+            self.started = time.monotonic()
+        for selector in eligible_selectors(self.tiers, time.monotonic() - self.started):
+            by = By.XPATH if selector.startswith("//") else By.CSS_SELECTOR
+            for element in driver.find_elements(by, selector):
+                try:
+                    if element.is_displayed() and (not self.clickable or element.is_enabled()):
+                        return selector, element
+                except StaleElementReferenceException:
+                    continue
+        return False
+
+class SelectorRegistry:
+    """记录每个步骤命中的选择器并持久化，下次优先尝试上次命中的选择器"""
+    
+    def __init__(self, path):
+        self.path = path
+        self.stats = self._load()
+        # 本次运行的探测统计：{步骤: {'probes': 次数, 'misses': 次数, 'lost': 未命中耗时}}
+        self.run_stats = {}
+        self._lock = threading.Lock()
+    
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            logger.warning(f"读取选择器统计失败，忽略: {e}")
+            return {}
+    
+    def order(self, step, tiers):
+        """只在每个特异性层内部排序：上次命中的排第一，其余按历史命中次数排序，次数相同保持原顺序
+        
+        层的先后不变，通用选择器的历史命中不会让它越过更具体的选择器。
+        """
+        with self._lock:
+            step_stats = self.stats.get(step, {})
+            winner = step_stats.get('winner')
+            hits = dict(step_stats.get('hits', {}))
+        return [sorted(tier, key=lambda sel: (sel != winner, -hits.get(sel, 0))) for tier in tiers]
+    
+    def record(self, step, selector, hit, elapsed):
+        with self._lock:
+            run = self.run_stats.setdefault(step, {'probes': 0, 'misses': 0, 'lost': 0.0})
+            run['probes'] += 1
+            if not hit:
+                run['misses'] += 1
+                run['lost'] += elapsed
+                return
+            step_stats = self.stats.setdefault(step, {'winner': None, 'hits': {}})
+            step_stats['winner'] = selector
+            step_stats['hits'][selector] = step_stats['hits'].get(selector, 0) + 1
+    
+    def report(self):
+        """输出本次运行各步骤的探测次数和未命中耗时"""
+        with self._lock:
+            for step, run in self.run_stats.items():
+                logger.info(
+                    f"选择器统计 [{step}]: 探测 {run['probes']} 次，未命中 {run['misses']} 次，"
+                    f"未命中耗时 {run['lost']:.1f} 秒，当前首选 {self.stats.get(step, {}).get('winner')}"
+                )
+    
+    def save(self):
+        if not self.path:
+            return
+        with self._lock:
+            # 先写临时文件再替换，多个进程同时保存或中途退出时不会留下半截 JSON
+            tmp_path = f"{self.path}.tmp"
+            try:
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(self.stats, f, ensure_ascii=False, indent=2)
+                os.replace(tmp_path, self.path)
+            except Exception as e:
+                logger.warning(f"保存选择器统计失败: {e}")
+
+selector_registry = SelectorRegistry(SELECTOR_STATS_FILE)
+
+# 注入脚本共用的可见性判断：自身未被 display/visibility 隐藏且实际占据布局（祖先 display:none 时没有 ClientRect）
+# 不能用 offsetParent 判断，fixed 定位元素的 offsetParent 总是 null
+VISIBLE_JS = """
+    const visible = el => {
+        const style = getComputedStyle(el);
+        return style.display !== 'none' && style.visibility !== 'hidden' && el.getClientRects().length > 0;
+    };
+"""
+
+# 页面上是否有可见的弹窗/遮罩层
+POPUP_SCRIPT = VISIBLE_JS + """
+    return Array.from(document.querySelectorAll(
+        '[role="dialog"], .modal, .el-dialog, .ant-modal, [class*="popup"], [class*="overlay"], [class*="mask"]'
+    )).some(visible);
+"""
+
+# 返回 arguments[0] 中第一个可见且有文本的提示元素的文本，没有则返回 null
+TOAST_SCRIPT = VISIBLE_JS + """
+    for (const selector of arguments[0]) {
+        for (const el of document.querySelectorAll(selector)) {
+            const text = (el.innerText || '').trim();
+            if (text && visible(el)) return text;
+        }
+    }
+    return null;
+"""
+
+# 一次 execute_script 填写多个输入框：arguments[0] 为 [[候选选择器...], 值] 列表，返回每项命中的选择器或 null
+# 通过原生 value setter 赋值并派发 input/change 事件，Vue/React 等框架才能感知到值的变化
+FILL_FIELDS_SCRIPT = VISIBLE_JS + """
+    const matched = [];
+    for (const [selectors, value] of arguments[0]) {
+        let hit = null;
+        for (const selector of selectors) {
+            const el = Array.from(document.querySelectorAll(selector))
+                .find(e => visible(e) && !e.disabled && !e.readOnly);
+            if (!el) continue;
+            const proto = el instanceof HTMLTextAreaElement ? HTMLTextAreaElement.prototype : HTMLInputElement.prototype;
+            el.focus();
+            Object.getOwnPropertyDescriptor(proto, 'value').set.call(el, value);
+            el.dispatchEvent(new Event('input', {bubbles: true}));
+            el.dispatchEvent(new Event('change', {bubbles: true}));
+            el.blur();
+            hit = selector;
+            break;
+        }
+        matched.push(hit);
+    }
+    return matched;
+"""
+
+# 一次 execute_script 收集页面状态：arguments[0] 为提示消息选择器，arguments[1] 为按钮选择器，arguments[2] 为关键词
+# 返回 {messages: [{selector, text}], buttons: [{text, disabled, className}], lines: [包含关键词的短行]}
+PAGE_STATE_SCRIPT = VISIBLE_JS + """
+    const messages = [];
+    for (const selector of arguments[0]) {
+        for (const el of document.querySelectorAll(selector)) {
+            const text = (el.innerText || '').trim();
+            if (text && visible(el)) messages.push({selector: selector, text: text});
+        }
+    }
+    const buttons = Array.from(document.querySelectorAll(arguments[1])).filter(visible).map(el => ({
+        text: (el.innerText || el.value || '').trim(),
+        disabled: !!el.disabled,
+        className: typeof el.className === 'string' ? el.className : '',
+    }));
+    const lines = (document.body ? document.body.innerText : '').split('\\n')
+        .map(line => line.trim())
+        .filter(line => line && line.length < 100 && arguments[2].some(k => line.includes(k)));
+    return {messages: messages, buttons: buttons, lines: lines};
+"""
+
+class MemoryGovernor:
+    """浏览器内存管控：所有浏览器进程树的 RSS 加上正在启动的浏览器的预留和一个新浏览器的估算超过上限时，暂停启动新浏览器
+    
+    登记的浏览器（SharedBrowser、CdpBrowser）需要提供 running() 和 rss_mb()。
+    """
+    
+    def __init__(self, limit_mb, default_estimate_mb=BROWSER_MEMORY_MB):
+        self.limit_mb = limit_mb
+        self.default_estimate_mb = default_estimate_mb
+        self.browsers = []
+        self.peak_mb = 0
+        # 已放行但还没启动完成的浏览器预留的内存
+        self.pending_mb = 0
+        self._cond = threading.Condition()
+    
+    def register(self, browser):
+        with self._cond:
+            self.browsers.append(browser)
+    
+    def usage(self):
+        """返回 (总 RSS, 单个浏览器估算)"""
+        sizes = [b.rss_mb() for b in self.browsers if b.running()]
+        sizes = [size for size in sizes if size > 0]
+        total = sum(sizes)
+        self.peak_mb = max(self.peak_mb, total)
+        estimate = max(sizes) if sizes else self.default_estimate_mb
+        return total, estimate
+    
+    @contextmanager
+    def admit(self):
+        """在 with 块中启动浏览器：先等待内存允许并预留一个浏览器的估算，启动完成或失败后释放预留
+        
+        没有运行中和启动中的浏览器时总是允许。预留在锁内完成，多个线程同时启动时不会都看到空闲内存。
+        """
+        if not self.limit_mb:
+            yield
+            return
+        warned = False
+        with self._cond:
+            while True:
+                total, estimate = self.usage()
+                busy = self.pending_mb or any(b.running() for b in self.browsers)
+                if not busy or total + self.pending_mb + estimate <= self.limit_mb:
+                    break
+                if not warned:
+                    logger.info(
+                        f"浏览器内存 {total}MB + 启动中 {self.pending_mb}MB + 预估 {estimate}MB "
+                        f"超过上限 {self.limit_mb}MB，等待其他浏览器释放..."
+                    )
+                    warned = True
+                self._cond.wait(timeout=2)
+            self.pending_mb += estimate
+        try:
+            yield
+        finally:
+            with self._cond:
+                self.pending_mb -= estimate
+                self._cond.notify_all()
+    
+    def released(self):
+        with self._cond:
+            self._cond.notify_all()
+
+class CommandProfiler:
+    """记录单个账号的 WebDriver 命令、条件等待和固定等待的耗时及调用步骤"""
+    
+    # 作为条件等待记录的方法
+    WAIT_METHODS = (
+        'wait_for_popup', 'wait_for_document_ready', 'wait_for_network_idle', 'wait_for_url_change',
+        'wait_for_toast', 'wait_for_element_clickable', 'wait_for_element_present', 'wait_for_any',
+    )
+    # 不作为“步骤”的辅助方法，步骤取调用栈中最内层的其他方法
+    HELPER_METHODS = WAIT_METHODS + ('locate', 'fill_fields', 'page_state', 'record_page_stats')
+    
+    _local = threading.local()
+    
+    def __init__(self, email):
+        self.account = email[:3] + "***" + email[email.find("@"):]
+        self.owner = None
+        self.driver = None
+        self.events = []
+        # 正在计时的事件，用于扣除嵌套事件的耗时得到自身耗时
+        self._open = []
+        self.started = time.monotonic()
+    
+    def attach(self, owner):
+        """包装 owner.driver 的 execute（所有 WebDriver/CDP 命令都经过它）和 owner 的等待方法"""
+        self.owner = owner
+        self.wrap_driver(owner.driver)
+        for name in self.WAIT_METHODS:
+            setattr(owner, name, self._wrap_wait(name, getattr(owner, name)))
+        CommandProfiler._local.current = self
+    
+    def wrap_driver(self, driver):
+        """包装 driver.execute，流程中途重新启动浏览器后对新的 driver 再调用一次"""
+        self.driver = driver
+        execute = driver.execute
+        
+        def profiled_execute(command, params=None):
+            with self.measure('command', command):
+                return execute(command, params)
+        driver.execute = profiled_execute
+    
+    def _wrap_wait(self, name, method):
+        def profiled_wait(*args, **kwargs):
+            with self.measure('wait', name):
+                return method(*args, **kwargs)
+        return profiled_wait
+    
+    def detach(self):
+        if self.driver is not None:
+            self.driver.__dict__.pop('execute', None)
+        if self.owner is not None:
+            for name in self.WAIT_METHODS:
+                self.owner.__dict__.pop(name, None)
+        CommandProfiler._local.current = None
+    
+    @classmethod
+    def measure_current(cls, kind, name):
+        """当前线程有正在分析的账号时计时，否则什么也不做"""
+        profiler = getattr(cls._local, 'current', None)
+        return profiler.measure(kind, name) if profiler else nullcontext()
+    
+    def call_stack(self):
+        """owner 的方法调用链，由外到内"""
+        names = []
+        frame = sys._getframe(1)
+        while frame is not None:
+            if frame.f_locals.get('self') is self.owner:
+                names.append(frame.f_code.co_name)
+            frame = frame.f_back
+        return names[::-1]
+    
+    @contextmanager
+    def measure(self, kind, name):
+        stack = self.call_stack()
+        step = next((n for n in reversed(stack) if n not in self.HELPER_METHODS), stack[-1] if stack else '')
+        event = {
+            'kind': kind,
+            'name': name,
+            'step': step,
+            'stack': stack,
+            'start': round(time.monotonic() - self.started, 4),
+        }
+        self._open.append(0.0)
+        begin = time.monotonic()
+        try:
+            yield
+        finally:
+            duration = time.monotonic() - begin
+            nested = self._open.pop()
+            if self._open:
+                self._open[-1] += duration
+            event['duration'] = round(duration, 4)
+            event['self'] = round(duration - nested, 4)
+            self.events.append(event)
+    
+    def report(self):
+        return {
+            'account': self.account,
+            'total': round(time.monotonic() - self.started, 4),
+            'events': sorted(self.events, key=lambda e: e['start']),
+        }
+    
+    @staticmethod
+    def summarize(reports):
+        """汇总所有账号：按类型、步骤、命令统计，并生成按调用栈折叠的自身耗时（可直接用于火焰图）"""
+        by_kind, by_step, by_name, flame = {}, {}, {}, {}
+        for report in reports:
+            for event in report['events']:
+                for table, key, value in (
+                    (by_kind, event['kind'], event['self']),
+                    (by_step, event['step'], event['self']),
+                    (by_name, f"{event['kind']}:{event['name']}", event['duration']),
+                ):
+                    entry = table.setdefault(key, {'count': 0, 'seconds': 0.0})
+                    entry['count'] += 1
+                    entry['seconds'] = round(entry['seconds'] + value, 4)
+                # 等待本身就是 owner 的方法，用方法名作为栈帧，命令才能嵌套在它下面
+                label = event['name'] if event['kind'] == 'wait' else f"{event['kind']}:{event['name']}"
+                path = ';'.join(event['stack'] + [label])
+                flame[path] = round(flame.get(path, 0.0) + event['self'], 4)
+        return {
+            'accounts': len(reports),
+            'total': round(sum(r['total'] for r in reports), 4),
+            'by_kind': by_kind,
+            'by_step': by_step,
+            'by_name': dict(sorted(by_name.items(), key=lambda item: -item[1]['seconds'])),
+            'flame': dict(sorted(flame.items(), key=lambda item: -item[1])),
+        }
+    
+    @classmethod
+    def write(cls, path, reports):
+        summary = cls.summarize(reports)
+        try:
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump({'summary': summary, 'accounts': reports}, f, ensure_ascii=False, indent=2)
+        except Exception as e:
+            logger.warning(f"保存耗时分析失败: {e}")
+            return
+        for kind, entry in summary['by_kind'].items():
+            logger.info(f"耗时分析 [{kind}]: {entry['count']} 次，自身耗时 {entry['seconds']:.1f} 秒")
+        logger.info(f"耗时分析已保存到 {path}")
+
+def checkin_result_from_state(state):
+    """根据 PAGE_STATE_SCRIPT 收集的页面状态推断签到结果"""
+    if state['messages']:
+        return state['messages'][0]['text']
+    
+    for keyword in RESULT_KEYWORDS:
+        for line in state['lines']:
+            if keyword in line:
+                return line
+    
+    # 检查签到按钮状态变化
+    for button in state['buttons']:
+        if button['disabled'] or "已签到" in button['text'] or "disabled" in button['className']:
+            return "今日已签到完成"
+    
+    return "签到完成，但未找到具体结果消息"
+
 class LeaflowAutoCheckin:
-    def __init__(self, email, password):
+    def __init__(self, email, password, driver=None, session_store=None):
         self.email = email
         self.password = password
+        self.session_store = session_store
+        # 本次会话中各站点的 localStorage {origin: {key: value}}
+        self.local_storage = {}
+        # 恢复 localStorage 的注入脚本 ID，结束时移除，避免影响复用浏览器的下一个账号
+        self.restore_script_id = None
         self.telegram_bot_token = os.getenv('TELEGRAM_BOT_TOKEN', '')
         self.telegram_chat_id = os.getenv('TELEGRAM_CHAT_ID', '')
         
         if not self.email or not self.password:
             raise ValueError("邮箱和密码不能为空")
         
-        self.driver = None
-        self.setup_driver()
+        # 每个页面的加载耗时和传输字节数
+        self.page_stats = []
+        
+        # 传入 driver 时由调用方负责浏览器的生命周期
+        self.driver = driver
+        self.owns_driver = driver is None
+        if self.owns_driver:
+            self.setup_driver()
+        
+        self.profiler = None
+        if PROFILE_FILE:
+            self.profiler = CommandProfiler(email)
+            self.profiler.attach(self)
     
     def setup_driver(self):
         """设置Chrome驱动选项"""
-        chrome_options = Options()
-        
-        # GitHub Actions环境配置
-        if os.getenv('GITHUB_ACTIONS'):
-            chrome_options.add_argument('--headless')
-            chrome_options.add_argument('--no-sandbox')
-            chrome_options.add_argument('--disable-dev-shm-usage')
-            chrome_options.add_argument('--disable-gpu')
-            chrome_options.add_argument('--window-size=1920,1080')
-        
-        # 通用配置
-        chrome_options.add_argument('--disable-blink-features=AutomationControlled')
-        chrome_options.add_experimental_option("excludeSwitches", ["enable-automation"])
-        chrome_options.add_experimental_option('useAutomationExtension', False)
-        
-        self.driver = webdriver.Chrome(options=chrome_options)
-        self.driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
+        self.driver = create_driver()
         
     def close_popup(self):
         """关闭初始弹窗 - 通过点击外部区域"""
         try:
             logger.info("尝试关闭初始弹窗...")
-            time.sleep(3)  # 等待弹窗加载
+            # 等待弹窗出现，没有弹窗时最多等待 popup 超时
+            self.wait_for_popup(wait_timeout('popup'))
+            fallback_sleep(3)
             
-            # 尝试点击页面左上角空白处关闭弹窗
+            # 尝试点击页面左上角空白处关闭弹窗（使用绝对坐标，复用浏览器时指针位置不累加）
             try:
-                actions = ActionChains(self.driver)
-                actions.move_by_offset(10, 10).click().perform()
+                actions = ActionBuilder(self.driver)
+                actions.pointer_action.move_to_location(10, 10).click()
+                actions.perform()
                 logger.info("已成功关闭弹窗")
-                time.sleep(2)
+                fallback_sleep(2)
                 return True
             except:
                 pass
@@ -75,6 +1017,124 @@ class LeaflowAutoCheckin:
             logger.warning(f"关闭弹窗时出错: {e}")
             return False
     
+    def wait_for_popup(self, timeout):
+        """等待弹窗/遮罩层出现，返回是否出现"""
+        try:
+            WebDriverWait(self.driver, timeout, poll_frequency=0.2).until(
+                lambda driver: driver.execute_script(POPUP_SCRIPT)
+            )
+            return True
+        except TimeoutException:
+            return False
+    
+    def record_page_stats(self, name):
+        """记录当前页面的加载耗时和传输字节数（跨域且未开放 Timing-Allow-Origin 的资源计为 0）"""
+        script = """
+            const nav = performance.getEntriesByType('navigation')[0];
+            const resources = performance.getEntriesByType('resource');
+            let bytes = nav ? nav.transferSize : 0;
+            for (const r of resources) bytes += r.transferSize || 0;
+            return {
+                load_ms: nav ? Math.round((nav.loadEventEnd || performance.now()) - nav.startTime) : null,
+                bytes: bytes,
+                requests: resources.length + 1,
+            };
+        """
+        try:
+            stats = self.driver.execute_script(script)
+        except WebDriverException as e:
+            logger.debug(f"获取页面加载统计失败: {e}")
+            return
+        stats['page'] = name
+        self.page_stats.append(stats)
+        logger.info(f"页面加载 [{name}]: {stats['load_ms']} ms，{stats['bytes'] / 1024:.1f} KB，{stats['requests']} 个请求")
+    
+    def log_page_stats(self):
+        """输出本账号的页面加载汇总"""
+        if not self.page_stats:
+            return
+        total_ms = sum(s['load_ms'] or 0 for s in self.page_stats)
+        total_bytes = sum(s['bytes'] for s in self.page_stats)
+        logger.info(f"页面加载汇总: {len(self.page_stats)} 个页面，共 {total_ms} ms，{total_bytes / 1024:.1f} KB")
+    
+    def fill_fields(self, fields):
+        """一次调用填写多个输入框，fields 为 [(步骤, 候选选择器, 值)]，返回每项命中的选择器（未命中为 None）"""
+        # 脚本立即执行，所有层都参与，但具体的层排在前面
+        ordered = [
+            ([selector for tier in selector_registry.order(step, tiers) for selector in tier], value)
+            for step, tiers, value in fields
+        ]
+        start = time.monotonic()
+        try:
+            matched = self.driver.execute_script(FILL_FIELDS_SCRIPT, ordered)
+        except WebDriverException as e:
+            logger.debug(f"脚本填写表单失败: {e}")
+            return [None] * len(fields)
+        elapsed = time.monotonic() - start
+        for (step, _, _), selector in zip(fields, matched):
+            selector_registry.record(step, selector, selector is not None, elapsed)
+        return matched
+    
+    def page_state(self, message_selectors, button_selector, keywords=()):
+        """一次调用收集可见提示消息、按钮状态和包含关键词的文本行"""
+        try:
+            return self.driver.execute_script(PAGE_STATE_SCRIPT, message_selectors, button_selector, list(keywords))
+        except WebDriverException as e:
+            logger.debug(f"获取页面状态失败: {e}")
+            return {'messages': [], 'buttons': [], 'lines': []}
+    
+    def wait_for_document_ready(self, timeout=None):
+        """等待 document.readyState 变为 complete"""
+        timeout = wait_timeout('page_ready') if timeout is None else timeout
+        try:
+            WebDriverWait(self.driver, timeout, poll_frequency=0.2).until(
+                lambda driver: driver.execute_script("return document.readyState") == "complete"
+            )
+            return True
+        except TimeoutException:
+            logger.warning(f"页面在 {timeout} 秒内未加载完成")
+            return False
+    
+    def wait_for_network_idle(self, timeout=None, idle_time=NETWORK_IDLE_TIME):
+        """等待页面加载完成且 idle_time 秒内没有新的资源请求"""
+        timeout = wait_timeout('network_idle') if timeout is None else timeout
+        script = "return [document.readyState, performance.getEntriesByType('resource').length]"
+        deadline = time.monotonic() + timeout
+        last_count = None
+        stable_since = time.monotonic()
+        while time.monotonic() < deadline:
+            try:
+                state, count = self.driver.execute_script(script)
+            except WebDriverException:
+                # 页面跳转过程中脚本可能执行失败，继续等待
+                state, count = None, None
+            now = time.monotonic()
+            if count != last_count or state != "complete":
+                last_count = count
+                stable_since = now
+            elif now - stable_since >= idle_time:
+                return True
+            time.sleep(0.1)
+        logger.warning(f"网络在 {timeout} 秒内未空闲")
+        return False
+    
+    def wait_for_url_change(self, predicate, timeout=None):
+        """等待当前 URL 满足条件"""
+        timeout = wait_timeout('url_change') if timeout is None else timeout
+        return WebDriverWait(self.driver, timeout, poll_frequency=0.2).until(
+            lambda driver: predicate(driver.current_url)
+        )
+    
+    def wait_for_toast(self, selectors, timeout=None):
+        """等待任一提示元素可见且有文本，返回文本，超时返回 None"""
+        timeout = wait_timeout('toast') if timeout is None else timeout
+        try:
+            return WebDriverWait(self.driver, timeout, poll_frequency=0.2).until(
+                lambda driver: driver.execute_script(TOAST_SCRIPT, selectors)
+            )
+        except TimeoutException:
+            return None
+    
     def wait_for_element_clickable(self, by, value, timeout=10):
         """等待元素可点击"""
         return WebDriverWait(self.driver, timeout).until(
@@ -87,102 +1147,97 @@ class LeaflowAutoCheckin:
             EC.presence_of_element_located((by, value))
         )
     
+    def wait_for_any(self, tiers, timeout, clickable=False):
+        """同时等待分层的 CSS/XPath 选择器，任一可见即返回 (选择器, 元素)，超时返回 (None, None)"""
+        try:
+            return WebDriverWait(self.driver, timeout, poll_frequency=0.2).until(
+                any_of_visible(tiers, clickable)
+            )
+        except TimeoutException:
+            return None, None
+    
+    def locate(self, step, tiers, timeout, clickable=False):
+        """同时等待该步骤的所有候选选择器，具体的层优先，同一层内按历史命中顺序优先"""
+        start = time.monotonic()
+        selector, element = self.wait_for_any(selector_registry.order(step, tiers), timeout, clickable)
+        selector_registry.record(step, selector, element is not None, time.monotonic() - start)
+        if selector:
+            logger.debug(f"[{step}] 命中选择器: {selector}")
+        return selector, element
+    
     def login(self):
         """执行登录流程"""
         logger.info(f"开始登录流程")
         
         # 访问登录页面
-        self.driver.get("https://leaflow.net/login")
-        time.sleep(5)  # 增加初始等待时间
+        self.driver.get(LOGIN_URL)
+        self.wait_for_document_ready()
+        self.record_page_stats('login')
+        fallback_sleep(5)
         
         # 关闭弹窗
         self.close_popup()
         
+        # 等待页面稳定
+        self.wait_for_network_idle()
+        fallback_sleep(2)
+        
+        # 先用一次脚本调用同时填写邮箱和密码，未命中的输入框再逐个等待后输入
+        email_filled, password_filled = self.fill_fields([
+            ('email_input', EMAIL_SELECTORS, self.email),
+            ('password_input', PASSWORD_SELECTORS, self.password),
+        ])
+        
         # 输入邮箱
-        try:
-            logger.info("查找邮箱输入框...")
-            
-            # 等待页面稳定
-            time.sleep(2)
-            
-            # 尝试多种选择器找到邮箱输入框
-            email_selectors = [
-                "input[type='text']",
-                "input[type='email']", 
-                "input[placeholder*='邮箱']",
-                "input[placeholder*='邮件']",
-                "input[placeholder*='email']",
-                "input[name='email']",
-                "input[name='username']"
-            ]
-            
-            email_input = None
-            for selector in email_selectors:
-                try:
-                    email_input = self.wait_for_element_clickable(By.CSS_SELECTOR, selector, 5)
-                    logger.info(f"找到邮箱输入框")
-                    break
-                except:
-                    continue
-            
-            if not email_input:
-                raise Exception("找不到邮箱输入框")
-            
-            # 清除并输入邮箱
-            email_input.clear()
-            email_input.send_keys(self.email)
-            logger.info("邮箱输入完成")
-            time.sleep(2)
-            
-        except Exception as e:
-            logger.error(f"输入邮箱时出错: {e}")
-            # 尝试使用JavaScript直接设置值
+        if email_filled:
+            logger.info(f"邮箱输入完成: {email_filled}")
+        else:
             try:
-                self.driver.execute_script(f"document.querySelector('input[type=\"text\"], input[type=\"email\"]').value = '{self.email}';")
+                logger.info("查找邮箱输入框...")
+                selector, email_input = self.locate('email_input', EMAIL_SELECTORS, wait_timeout('element'), clickable=True)
+                if not email_input:
+                    raise Exception("找不到邮箱输入框")
+                logger.info(f"找到邮箱输入框: {selector}")
+                
+                # 清除并输入邮箱
+                email_input.clear()
+                email_input.send_keys(self.email)
+                logger.info("邮箱输入完成")
+                fallback_sleep(2)
+                
+            except Exception as e:
+                logger.error(f"输入邮箱时出错: {e}")
+                # 尝试使用JavaScript直接设置值
+                email_filled, = self.fill_fields([('email_input', [["input[type='text']", "input[type='email']"]], self.email)])
+                if not email_filled:
+                    raise Exception(f"无法输入邮箱: {e}")
                 logger.info("通过JavaScript设置邮箱")
-                time.sleep(2)
-            except:
-                raise Exception(f"无法输入邮箱: {e}")
+                fallback_sleep(2)
         
-        # 等待密码输入框出现并输入密码
-        try:
-            logger.info("查找密码输入框...")
-            
-            # 等待密码框出现
-            password_input = self.wait_for_element_clickable(
-                By.CSS_SELECTOR, "input[type='password']", 10
-            )
-            
-            password_input.clear()
-            password_input.send_keys(self.password)
+        # 部分页面在输入邮箱后才显示密码框，此时等待密码框出现再输入
+        if password_filled:
             logger.info("密码输入完成")
-            time.sleep(1)
-            
-        except TimeoutException:
-            raise Exception("找不到密码输入框")
+        else:
+            try:
+                logger.info("查找密码输入框...")
+                password_input = self.wait_for_element_clickable(
+                    By.CSS_SELECTOR, "input[type='password']", wait_timeout('element')
+                )
+                
+                password_input.clear()
+                password_input.send_keys(self.password)
+                logger.info("密码输入完成")
+                fallback_sleep(1)
+                
+            except TimeoutException:
+                raise Exception("找不到密码输入框")
         
         # 点击登录按钮
         try:
             logger.info("查找登录按钮...")
-            login_btn_selectors = [
-                "//button[contains(text(), '登录')]",
-                "//button[contains(text(), 'Login')]",
-                "//button[@type='submit']",
-                "//input[@type='submit']",
-                "button[type='submit']"
-            ]
-            
-            login_btn = None
-            for selector in login_btn_selectors:
-                try:
-                    if selector.startswith("//"):
-                        login_btn = self.wait_for_element_clickable(By.XPATH, selector, 5)
-                    else:
-                        login_btn = self.wait_for_element_clickable(By.CSS_SELECTOR, selector, 5)
-                    logger.info(f"找到登录按钮")
-                    break
-                except:
-                    continue
+            selector, login_btn = self.locate('login_button', LOGIN_BUTTON_SELECTORS, wait_timeout('element'), clickable=True)
+            if login_btn:
+                logger.info(f"找到登录按钮: {selector}")
             
             if not login_btn:
                 raise Exception("找不到登录按钮")
@@ -195,8 +1250,8 @@ class LeaflowAutoCheckin:
         
         # 等待登录完成
         try:
-            WebDriverWait(self.driver, 20).until(
-                lambda driver: "dashboard" in driver.current_url or "workspaces" in driver.current_url or "login" not in driver.current_url
+            self.wait_for_url_change(
+                lambda url: "dashboard" in url or "workspaces" in url or "login" not in url
             )
             
             # 检查当前URL确认登录成功
@@ -209,51 +1264,27 @@ class LeaflowAutoCheckin:
                 
         except TimeoutException:
             # 检查是否登录失败
-            try:
-                error_selectors = [".error", ".alert-danger", "[class*='error']", "[class*='danger']"]
-                for selector in error_selectors:
-                    try:
-                        error_msg = self.driver.find_element(By.CSS_SELECTOR, selector)
-                        if error_msg.is_displayed():
-                            raise Exception(f"登录失败: {error_msg.text}")
-                    except:
-                        continue
-                raise Exception("登录超时，无法确认登录状态")
-            except Exception as e:
-                raise e
+            messages = self.page_state(LOGIN_ERROR_SELECTORS, "button[type='submit']")['messages']
+            if messages:
+                raise Exception(f"登录失败: {messages[0]['text']}")
+            raise Exception("登录超时，无法确认登录状态")
     
     def wait_for_checkin_page_loaded(self, max_retries=3, wait_time=20):
         """等待签到页面完全加载，支持重试"""
         for attempt in range(max_retries):
-            logger.info(f"等待签到页面加载，尝试 {attempt + 1}/{max_retries}，等待 {wait_time} 秒...")
-            time.sleep(wait_time)
+            logger.info(f"等待签到页面加载，尝试 {attempt + 1}/{max_retries}，最多等待 {wait_time} 秒...")
+            self.wait_for_document_ready(timeout=wait_time)
+            self.wait_for_network_idle()
+            if attempt == 0:
+                self.record_page_stats('checkin')
+            fallback_sleep(wait_time)
             
             try:
                 # 检查页面是否包含签到相关元素
-                checkin_indicators = [
-                    "button.checkin-btn",  # 优先使用这个选择器
-                    "//button[contains(text(), '立即签到')]",
-                    "//button[contains(text(), '已签到')]",
-                    "//*[contains(text(), '每日签到')]",
-                    "//*[contains(text(), '签到')]"
-                ]
-                
-                for indicator in checkin_indicators:
-                    try:
-                        if indicator.startswith("//"):
-                            element = WebDriverWait(self.driver, 10).until(
-                                EC.presence_of_element_located((By.XPATH, indicator))
-                            )
-                        else:
-                            element = WebDriverWait(self.driver, 10).until(
-                                EC.presence_of_element_located((By.CSS_SELECTOR, indicator))
-                            )
-                        
-                        if element.is_displayed():
-                            logger.info(f"找到签到页面元素")
-                            return True
-                    except:
-                        continue
+                selector, element = self.locate('checkin_page', CHECKIN_INDICATORS, wait_timeout('element'))
+                if element:
+                    logger.info(f"找到签到页面元素: {selector}")
+                    return True
                 
                 logger.warning(f"第 {attempt + 1} 次尝试未找到签到按钮，继续等待...")
                 
@@ -268,60 +1299,41 @@ class LeaflowAutoCheckin:
         
         try:
             # 先等待页面可能的重载
-            time.sleep(5)
+            self.wait_for_network_idle()
+            fallback_sleep(5)
             
-            checkin_selectors = [
-                "button.checkin-btn",  
-                "//button[contains(text(), '立即签到')]",
-                "//button[contains(@class, 'checkin')]",
-                "button[type='submit']",
-                "button[name='checkin']"
-            ]
+            selector, checkin_btn = self.locate('checkin_button', CHECKIN_BUTTON_SELECTORS, wait_timeout('element'))
+            if not checkin_btn:
+                logger.error("找不到签到按钮")
+                return False
+            logger.info(f"找到签到按钮: {selector}")
             
-            for selector in checkin_selectors:
-                try:
-                    if selector.startswith("//"):
-                        checkin_btn = WebDriverWait(self.driver, 15).until(
-                            EC.presence_of_element_located((By.XPATH, selector))
-                        )
-                    else:
-                        checkin_btn = WebDriverWait(self.driver, 15).until(
-                            EC.presence_of_element_located((By.CSS_SELECTOR, selector))
-                        )
-                    
-                    if checkin_btn.is_displayed():
-                        # 检查按钮文本，如果包含"已签到"则说明今天已经签到过了
-                        btn_text = checkin_btn.text.strip()
-                        if "已签到" in btn_text:
-                            logger.info("伙计，今日你已经签到过了！")
-                            return "already_checked_in"
-                        
-                        # 检查按钮是否可用
-                        if checkin_btn.is_enabled():
-                            logger.info(f"找到并点击立即签到按钮")
-                            checkin_btn.click()
-                            return True
-                        else:
-                            logger.info("签到按钮不可用，可能已经签到过了")
-                            return "already_checked_in"
-                        
-                except Exception as e:
-                    logger.debug(f"选择器未找到按钮: {e}")
-                    continue
+            # 检查按钮文本，如果包含"已签到"则说明今天已经签到过了
+            btn_text = checkin_btn.text.strip()
+            if "已签到" in btn_text:
+                logger.info("伙计，今日你已经签到过了！")
+                return "already_checked_in"
             
-            logger.error("找不到签到按钮")
-            return False
+            # 检查按钮是否可用
+            if checkin_btn.is_enabled():
+                logger.info(f"找到并点击立即签到按钮")
+                checkin_btn.click()
+                return True
+            else:
+                logger.info("签到按钮不可用，可能已经签到过了")
+                return "already_checked_in"
                     
         except Exception as e:
             logger.error(f"查找签到按钮时出错: {e}")
             return False
     
-    def checkin(self):
-        """执行签到流程"""
-        logger.info("跳转到签到页面...")
-        
-        # 跳转到签到页面
-        self.driver.get("https://checkin.leaflow.net")
+    def checkin(self, navigate=True):
+        """执行签到流程，navigate=False 表示已经在签到页面"""
+        if navigate:
+            logger.info("跳转到签到页面...")
+            
+            # 跳转到签到页面
+            self.driver.get(CHECKIN_URL)
         
         # 等待签到页面加载（最多重试3次，每次等待20秒）
         if not self.wait_for_checkin_page_loaded(max_retries=3, wait_time=20):
@@ -334,7 +1346,7 @@ class LeaflowAutoCheckin:
             return "今天你已经签到过了！"
         elif checkin_result is True:
             logger.info("已点击立即签到按钮")
-            time.sleep(5)  # 等待签到结果
+            fallback_sleep(5)
             
             # 获取签到结果
             result_message = self.get_checkin_result()
@@ -345,67 +1357,189 @@ class LeaflowAutoCheckin:
     def get_checkin_result(self):
         """获取签到结果消息"""
         try:
-            # 给页面一些时间显示结果
-            time.sleep(3)
+            # 等待结果提示出现
+            text = self.wait_for_toast(RESULT_SELECTORS)
+            fallback_sleep(3)
+            if text:
+                return text
             
-            # 尝试查找各种可能的成功消息元素
-            success_selectors = [
-                ".alert-success",
-                ".success",
-                ".message",
-                "[class*='success']",
-                "[class*='message']",
-                ".modal-content",  # 弹窗内容
-                ".ant-message",    # Ant Design 消息
-                ".el-message",     # Element UI 消息
-                ".toast",          # Toast消息
-                ".notification"    # 通知
-            ]
-            
-            for selector in success_selectors:
-                try:
-                    element = self.driver.find_element(By.CSS_SELECTOR, selector)
-                    if element.is_displayed():
-                        text = element.text.strip()
-                        if text:
-                            return text
-                except:
-                    continue
-            
-            # 如果没有找到特定元素，检查页面文本
-            page_text = self.driver.find_element(By.TAG_NAME, "body").text
-            important_keywords = ["成功", "签到", "获得", "恭喜", "谢谢", "感谢", "完成", "已签到", "连续签到"]
-            
-            for keyword in important_keywords:
-                if keyword in page_text:
-                    # 提取包含关键词的行
-                    lines = page_text.split('\n')
-                    for line in lines:
-                        if keyword in line and len(line.strip()) < 100:  # 避免提取过长的文本
-                            return line.strip()
-            
-            # 检查签到按钮状态变化
-            try:
-                checkin_btn = self.driver.find_element(By.CSS_SELECTOR, "button.checkin-btn")
-                if not checkin_btn.is_enabled() or "已签到" in checkin_btn.text or "disabled" in checkin_btn.get_attribute("class"):
-                    return "今日已签到完成"
-            except:
-                pass
-            
-            return "签到完成，但未找到具体结果消息"
+            # 如果没有找到特定元素，一次调用取回消息、按钮状态和包含关键词的短行
+            return checkin_result_from_state(self.page_state(RESULT_SELECTORS, "button.checkin-btn", RESULT_KEYWORDS))
             
         except Exception as e:
             return f"获取签到结果时出错: {str(e)}"
     
+    def capture_local_storage(self):
+        """记录当前页面所在站点的 localStorage"""
+        try:
+            origin, items = self.driver.execute_script(
+                "return [location.origin, Object.assign({}, window.localStorage)]"
+            )
+        except WebDriverException as e:
+            logger.debug(f"读取 localStorage 失败: {e}")
+            return
+        if origin in LEAFLOW_ORIGINS:
+            self.local_storage[origin] = items
+    
+    def save_session(self):
+        """把当前的 Leaflow Cookie 和 localStorage 写入会话快照"""
+        if not self.session_store:
+            return
+        try:
+            self.capture_local_storage()
+            cookies = self.driver.execute_cdp_cmd("Network.getAllCookies", {}).get("cookies", [])
+        except WebDriverException as e:
+            logger.warning(f"保存会话快照失败: {e}")
+            return
+        cookies = [
+            {key: cookie[key] for key in COOKIE_PARAM_KEYS if key in cookie}
+            for cookie in cookies
+            if cookie.get('domain', '').lstrip('.').endswith(COOKIE_DOMAIN)
+        ]
+        self.session_store.put(self.email, cookies, self.local_storage)
+    
+    def restore_session(self, snapshot):
+        """把会话快照恢复到浏览器：Cookie 直接写入，localStorage 在页面脚本执行前注入"""
+        # 会话 Cookie 的 expires 为 -1，写入时省略即可
+        cookies = [
+            {key: value for key, value in cookie.items() if key != 'expires' or value > 0}
+            for cookie in snapshot.get('cookies', [])
+        ]
+        self.driver.execute_cdp_cmd("Network.setCookies", {"cookies": cookies})
+        self.local_storage = dict(snapshot.get('local_storage', {}))
+        if self.local_storage:
+            source = """
+                (function (data) {
+                    const items = data[location.origin];
+                    if (!items) return;
+                    for (const [key, value] of Object.entries(items)) {
+                        if (localStorage.getItem(key) === null) localStorage.setItem(key, value);
+                    }
+                })(%s);
+            """ % json.dumps(self.local_storage)
+            self.restore_script_id = self.driver.execute_cdp_cmd(
+                "Page.addScriptToEvaluateOnNewDocument", {"source": source}
+            ).get("identifier")
+    
+    def remove_restore_script(self):
+        if not self.restore_script_id:
+            return
+        try:
+            self.driver.execute_cdp_cmd("Page.removeScriptToEvaluateOnNewDocument", {"identifier": self.restore_script_id})
+        except WebDriverException:
+            pass
+        self.restore_script_id = None
+    
+    def checkin_with_saved_session(self):
+        """用会话快照直接打开签到页面，会话失效时清理快照并返回 None"""
+        snapshot = self.session_store.get(self.email) if self.session_store else None
+        if not snapshot:
+            return None
+        logger.info("使用会话快照直接打开签到页面...")
+        try:
+            self.restore_session(snapshot)
+            self.driver.get(CHECKIN_URL)
+            self.wait_for_document_ready()
+            current_url = self.driver.current_url
+            logged_out = "login" in current_url or self.driver.execute_script(
+                "return !!document.querySelector(\"input[type='password']\")"
+            )
+            if not logged_out:
+                _, element = self.locate('checkin_page', CHECKIN_INDICATORS, wait_timeout('element'))
+                logged_out = element is None
+        except WebDriverException as e:
+            logger.warning(f"恢复会话快照失败: {e}")
+            logged_out = True
+        
+        if logged_out:
+            logger.info("会话快照已失效，重新登录")
+            self.session_store.discard(self.email)
+            self.remove_restore_script()
+            self.local_storage = {}
+            try:
+                self.driver.execute_cdp_cmd("Network.clearBrowserCookies", {})
+            except WebDriverException:
+                pass
+            return None
+        
+        self.record_page_stats('checkin')
+        return self.checkin(navigate=False)
+    
+    def export_session(self, cookies):
+        """把 CDP 取得的 Cookie 导出到 requests.Session"""
+        session = requests.Session()
+        for cookie in cookies:
+            session.cookies.set(
+                cookie['name'], cookie['value'],
+                domain=cookie.get('domain'), path=cookie.get('path', '/'),
+                secure=cookie.get('secure', False),
+                expires=int(cookie['expires']) if cookie.get('expires', -1) > 0 else None,
+            )
+        return session
+    
+    def checkin_over_http(self):
+        """登录后把 Cookie 交给 requests 签到，失败返回 None 由浏览器继续
+        
+        自己启动的浏览器在交接后立即退出，HTTP 签到回退时重新启动并恢复登录态；
+        共用的浏览器由调用方在本账号结束后回收。
+        """
+        try:
+            # WebDriver 的 get_cookies 只返回当前页面的 Cookie，这里通过 CDP 取全部
+            cookies = self.driver.execute_cdp_cmd("Network.getAllCookies", {}).get("cookies", [])
+            user_agent = self.driver.execute_script("return navigator.userAgent")
+            self.capture_local_storage()
+        except WebDriverException as e:
+            logger.warning(f"导出登录态失败，继续使用浏览器: {e}")
+            return None
+        session = self.export_session(cookies)
+        # 回退时用于在新浏览器中恢复登录态
+        snapshot = {
+            'cookies': [{key: cookie[key] for key in COOKIE_PARAM_KEYS if key in cookie} for cookie in cookies],
+            'local_storage': self.local_storage,
+        }
+        
+        if self.owns_driver:
+            logger.info("登录态已交给 HTTP，关闭浏览器")
+            self.driver.quit()
+            self.driver = None
+        
+        try:
+            http_checkin = LeaflowHttpCheckin(self.email, self.password, session, user_agent)
+            # 交接后浏览器已经关闭，误判会直接漏签，所以除了 parse_result 的判定，还要求签到页按钮确认已签到
+            result = http_checkin.checkin()
+            http_checkin.confirm_checked_in()
+            return result
+        except (HttpFlowFallback, requests.RequestException) as e:
+            logger.warning(f"HTTP 签到不可用，继续使用浏览器: {e}")
+        
+        if self.driver is None:
+            logger.info("重新启动浏览器并恢复登录态...")
+            self.setup_driver()
+            if self.profiler:
+                self.profiler.wrap_driver(self.driver)
+            self.restore_session(snapshot)
+        return None
+    
     def run(self):
         """单个账号执行流程"""
         try:
             logger.info(f"开始处理账号")
             
+            # 会话快照有效时跳过登录
+            result = self.checkin_with_saved_session()
+            if result is not None:
+                self.save_session()
+                logger.info(f"签到结果: {result}")
+                return True, result
+            
             # 登录
             if self.login():
-                # 签到
-                result = self.checkin()
+                self.save_session()
+                # 签到：先把浏览器登录态交给 HTTP，交接后浏览器立即释放
+                result = self.checkin_over_http() if HANDOFF_AFTER_LOGIN else None
+                if result is None:
+                    result = self.checkin()
+                    self.save_session()
                 logger.info(f"签到结果: {result}")
                 return True, result
             else:
@@ -417,9 +1551,705 @@ class LeaflowAutoCheckin:
             return False, error_msg
         
         finally:
-            if self.driver:
+            self.log_page_stats()
+            if self.profiler:
+                self.profiler.detach()
+            if self.driver and not self.owns_driver:
+                self.remove_restore_script()
+            if self.driver and self.owns_driver:
                 self.driver.quit()
 
+class HttpFlowFallback(Exception):
+    """纯 HTTP 流程无法继续，需要回退到浏览器"""
+
+class PageParser(HTMLParser):
+    """提取页面中的 CSRF token、表单、按钮和提示消息（flash/alert/toast 元素的文本，不含 script/style）"""
+    
+    def __init__(self):
+        super().__init__()
+        self.csrf_token = None
+        self.forms = []
+        # [{'attrs': 属性, 'text': 按钮文本, 'form': 所在表单或 None}]
+        self.buttons = []
+        self.messages = []
+        self._form = None
+        self._button = None
+        # 正在收集的提示元素 {'tag': 标签, 'depth': 同名标签嵌套层数, 'text': 文本}
+        self._message = None
+        self._skip = 0
+    
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if self._message is not None:
+            if tag == self._message['tag']:
+                self._message['depth'] += 1
+        elif attrs.get('role') == 'alert' or any(name in (attrs.get('class') or '') for name in HTTP_MESSAGE_CLASSES):
+            self._message = {'tag': tag, 'depth': 1, 'text': ''}
+        if tag == 'meta' and attrs.get('name') == 'csrf-token':
+            self.csrf_token = attrs.get('content')
+        elif tag == 'form':
+            self._form = {
+                'action': attrs.get('action', ''),
+                'method': (attrs.get('method') or 'get').lower(),
+                'fields': {},
+            }
+            self.forms.append(self._form)
+        elif tag == 'input' and self._form is not None:
+            if attrs.get('name') and attrs.get('type', 'text') not in ('submit', 'button'):
+                self._form['fields'][attrs['name']] = attrs.get('value', '')
+            if attrs.get('name') == '_token' and not self.csrf_token:
+                self.csrf_token = attrs.get('value')
+        elif tag == 'button':
+            self._button = {'attrs': attrs, 'text': '', 'form': self._form}
+            self.buttons.append(self._button)
+        elif tag in ('script', 'style'):
+            self._skip += 1
+    
+    def handle_endtag(self, tag):
+        if self._message is not None and tag == self._message['tag']:
+            self._message['depth'] -= 1
+            if not self._message['depth']:
+                if self._message['text']:
+                    self.messages.append(self._message['text'])
+                self._message = None
+        if tag == 'form':
+            self._form = None
+        elif tag == 'button':
+            self._button = None
+        elif tag in ('script', 'style') and self._skip:
+            self._skip -= 1
+    
+    def handle_data(self, data):
+        if self._skip:
+            return
+        if self._button is not None:
+            self._button['text'] += data.strip()
+        if self._message is not None:
+            self._message['text'] += data.strip()
+    
+    def checkin_buttons(self):
+        """签到按钮：class 含 checkin-btn、name 为 checkin 或按钮自身文本含“签到”"""
+        return [
+            button for button in self.buttons
+            if 'checkin-btn' in button['attrs'].get('class', '')
+            or button['attrs'].get('name') == 'checkin'
+            or '签到' in button['text']
+        ]
+    
+    @classmethod
+    def parse(cls, html):
+        parser = cls()
+        parser.feed(html)
+        return parser
+    
+
+class LeaflowHttpCheckin:
+    """基于 requests.Session 的免浏览器登录和签到"""
+    
+    def __init__(self, email, password, session=None, user_agent=HTTP_USER_AGENT):
+        self.email = email
+        self.password = password
+        self.session = session or requests.Session()
+        self.session.headers.update({
+            'User-Agent': user_agent,
+            'Accept': 'text/html,application/xhtml+xml,application/json;q=0.9,*/*;q=0.8',
+            'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8',
+        })
+    
+    def check_response(self, response):
+        """遇到人机验证或服务异常时抛出 HttpFlowFallback"""
+        if response.status_code in (403, 429, 503) or response.headers.get('cf-mitigated'):
+            raise HttpFlowFallback(f"{response.url} 返回 {response.status_code}")
+        text = response.text
+        for marker in CHALLENGE_MARKERS:
+            if marker in text:
+                raise HttpFlowFallback(f"{response.url} 出现人机验证 ({marker})")
+        if response.status_code >= 400:
+            raise HttpFlowFallback(f"{response.url} 返回 {response.status_code}")
+    
+    def csrf_headers(self, token):
+        headers = {'Referer': LOGIN_URL, 'Origin': LEAFLOW_BASE_URL}
+        if token:
+            headers['X-CSRF-TOKEN'] = token
+        xsrf = self.session.cookies.get('XSRF-TOKEN')
+        if xsrf:
+            headers['X-XSRF-TOKEN'] = unquote(xsrf)
+        return headers
+    
+    def login(self):
+        """提交登录表单，成功返回 True"""
+        logger.info("[HTTP] 开始登录流程")
+        response = self.session.get(LOGIN_URL, timeout=15)
+        self.check_response(response)
+        page = PageParser.parse(response.text)
+        
+        data = {'email': self.email, 'password': self.password, 'remember': 'on'}
+        if page.csrf_token:
+            data['_token'] = page.csrf_token
+        response = self.session.post(
+            LOGIN_URL, data=data, headers=self.csrf_headers(page.csrf_token), timeout=15
+        )
+        self.check_response(response)
+        
+        if 'application/json' in response.headers.get('Content-Type', ''):
+            result = response.json()
+            if result.get('redirect') or result.get('success') or result.get('status') in ('success', 'ok'):
+                logger.info("[HTTP] 登录成功")
+                return True
+            raise HttpFlowFallback(f"登录接口返回意外内容: {str(result)[:100]}")
+        if "login" in response.url:
+            raise HttpFlowFallback("登录后仍停留在登录页")
+        logger.info(f"[HTTP] 登录成功，当前URL: {response.url}")
+        return True
+    
+    def checkin(self):
+        """打开签到页并提交签到表单，返回结果消息"""
+        logger.info("[HTTP] 跳转到签到页面...")
+        response = self.session.get(CHECKIN_URL, timeout=15)
+        self.check_response(response)
+        if "login" in response.url:
+            raise HttpFlowFallback("签到页要求重新登录")
+        return self.submit_checkin(response)
+    
+    def submit_checkin(self, response):
+        """解析签到页，签到按钮本身显示已签到时直接返回，否则提交签到按钮所在的表单
+        
+        只看签到按钮自身的状态和文本，页面其他位置（例如脚本）出现“已签到”不算数。
+        """
+        page = PageParser.parse(response.text)
+        for button in page.checkin_buttons():
+            attrs, form = button['attrs'], button['form']
+            if 'disabled' in attrs or '已签到' in button['text']:
+                logger.info("[HTTP] 签到按钮显示已签到，今天已经签到过了")
+                return "今天你已经签到过了！"
+            if form is None:
+                raise HttpFlowFallback("签到按钮不在表单中，需要浏览器执行页面脚本")
+            data = dict(form['fields'])
+            if attrs.get('name'):
+                data[attrs['name']] = attrs.get('value', '')
+            action = urljoin(response.url, form['action'] or response.url)
+            headers = {'Referer': response.url, 'X-CSRF-TOKEN': page.csrf_token or ''}
+            if form['method'] == 'get':
+                result = self.session.get(action, params=data, headers=headers, timeout=15)
+            else:
+                result = self.session.post(action, data=data, headers=headers, timeout=15)
+            self.check_response(result)
+            return self.parse_result(result)
+        raise HttpFlowFallback("签到页没有找到签到按钮")
+    
+    def confirm_checked_in(self):
+        """重新打开签到页，签到按钮不可用或显示已签到才算签到完成，否则抛出 HttpFlowFallback"""
+        response = self.session.get(CHECKIN_URL, timeout=15)
+        self.check_response(response)
+        if "login" in response.url:
+            raise HttpFlowFallback("确认签到结果时要求重新登录")
+        for button in PageParser.parse(response.text).checkin_buttons():
+            if 'disabled' in button['attrs'] or '已签到' in button['text']:
+                return
+        raise HttpFlowFallback("签到页的签到按钮仍可点击，无法确认签到成功")
+    
+    def parse_result(self, response):
+        """从签到响应中提取结果消息，只有明确表示成功（或已签到）时才返回，否则抛出 HttpFlowFallback"""
+        if 'application/json' in response.headers.get('Content-Type', ''):
+            result = response.json()
+            if not isinstance(result, dict):
+                raise HttpFlowFallback(f"签到接口返回意外内容: {str(result)[:100]}")
+            message = str(result.get('message') or result.get('msg') or '')
+            status = str(result.get('status', '')).lower()
+            if (result.get('success') is False
+                    or result.get('code') not in (None, 0, 200, '0', '200')
+                    or status in ('error', 'fail', 'failed')
+                    or any(marker in message.lower() for marker in HTTP_FAILURE_MARKERS)):
+                raise HttpFlowFallback(f"签到接口返回失败: {str(result)[:100]}")
+            if any(keyword in message for keyword in HTTP_SUCCESS_KEYWORDS):
+                return message
+            if result.get('success') is True or status in ('success', 'ok'):
+                return message or "签到成功"
+            raise HttpFlowFallback(f"签到接口返回意外内容: {str(result)[:100]}")
+        # HTML 响应：只看提示消息元素和提交后签到按钮的状态，页面上的说明文字（例如“连续签到可获得奖励”）不算结果
+        page = PageParser.parse(response.text)
+        for message in page.messages:
+            if any(marker in message.lower() for marker in HTTP_FAILURE_MARKERS):
+                raise HttpFlowFallback(f"签到响应包含失败信息: {message}")
+        for message in page.messages:
+            if len(message) < 100 and any(keyword in message for keyword in HTTP_SUCCESS_KEYWORDS):
+                return message
+        for button in page.checkin_buttons():
+            if 'disabled' in button['attrs'] or '已签到' in button['text']:
+                logger.info("[HTTP] 提交后签到按钮显示已签到")
+                return "签到成功"
+        raise HttpFlowFallback("无法从签到响应中识别结果")
+    
+    def run(self):
+        """单个账号执行流程，需要回退时抛出 HttpFlowFallback"""
+        try:
+            self.login()
+            result = self.checkin()
+            logger.info(f"[HTTP] 签到结果: {result}")
+            return True, result
+        except requests.RequestException as e:
+            raise HttpFlowFallback(f"请求异常: {e}")
+
+class CdpEngineError(Exception):
+    """CDP 引擎无法启动或与 Chrome 的连接异常，需要回退到 Selenium"""
+
+class CdpPageError(Exception):
+    """页面级错误（脚本异常、导航失败、页面会话中的命令出错），按普通的签到失败处理，不回退到 Selenium"""
+
+# 查找第一个可见（可点击）的元素并滚动到视口中，返回选择器、文本、状态和中心坐标
+# CSS 和以 // 开头的 XPath 选择器都支持
+ELEMENT_SCRIPT = VISIBLE_JS + """
+    const find = selector => {
+        if (!selector.startsWith('//')) return Array.from(document.querySelectorAll(selector));
+        const result = document.evaluate(selector, document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+        return Array.from({length: result.snapshotLength}, (_, i) => result.snapshotItem(i));
+    };
+    for (const selector of arguments[0]) {
+        for (const el of find(selector)) {
+            if (!visible(el) || (arguments[1] && el.disabled)) continue;
+            el.scrollIntoView({block: 'center', inline: 'center'});
+            const rect = el.getBoundingClientRect();
+            return {
+                selector: selector,
+                text: (el.innerText || el.value || '').trim(),
+                disabled: !!el.disabled,
+                x: rect.left + rect.width / 2,
+                y: rect.top + rect.height / 2,
+            };
+        }
+    }
+    return null;
+"""
+
+class CdpBrowser:
+    """不经过 chromedriver、直接通过 DevTools 协议 websocket 控制的 Chrome
+    
+    只建立一条浏览器级连接，每个账号在独立的浏览器上下文中打开页面（Cookie 和存储互相隔离），
+    页面会话通过 flatten 模式的 sessionId 复用同一条连接。
+    """
+    
+    def __init__(self):
+        self.process = None
+        self.ws = None
+        self.user_data_dir = None
+        self.closed = True
+        self._next_id = 0
+        # 等待响应的命令 {id: [Event, 响应]}
+        self._pending = {}
+        self._listeners = []
+        self._lock = threading.Lock()
+    
+    def launch(self):
+        try:
+            import websocket
+        except ImportError:
+            raise CdpEngineError("未安装 websocket-client")
+        binary = CHROME_BINARY or next(filter(None, map(shutil.which, CHROME_NAMES)), None)
+        if not binary:
+            raise CdpEngineError("找不到 Chrome 可执行文件，可通过 LEAFLOW_CHROME_BINARY 指定")
+        
+        self.user_data_dir = tempfile.mkdtemp(prefix='leaflow-cdp-')
+        arguments = [
+            binary, *chrome_arguments(),
+            '--remote-debugging-port=0',
+            f'--user-data-dir={self.user_data_dir}',
+            '--no-first-run',
+            '--no-default-browser-check',
+        ]
+        if BLOCK_RESOURCES and 'image' in BLOCK_TYPES:
+            arguments.append('--blink-settings=imagesEnabled=false')
+        arguments.append('about:blank')
+        self.process = subprocess.Popen(arguments, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        
+        # 端口为 0 时 Chrome 自选端口，并把端口和浏览器 websocket 路径写入 DevToolsActivePort
+        port_file = os.path.join(self.user_data_dir, 'DevToolsActivePort')
+        deadline = time.monotonic() + wait_timeout('page_ready')
+        while True:
+            if self.process.poll() is not None:
+                self.quit()
+                raise CdpEngineError("Chrome 启动失败")
+            if time.monotonic() > deadline:
+                self.quit()
+                raise CdpEngineError("等待 Chrome 调试端口超时")
+            try:
+                with open(port_file, 'r', encoding='utf-8') as f:
+                    lines = f.read().split()
+                if len(lines) == 2:
+                    break
+            except OSError:
+                pass
+            time.sleep(0.05)
+        
+        try:
+            # 不发送 Origin 头，新版 Chrome 才不需要 --remote-allow-origins
+            self.ws = websocket.create_connection(f"ws://127.0.0.1:{lines[0]}{lines[1]}", suppress_origin=True)
+        except Exception as e:
+            self.quit()
+            raise CdpEngineError(f"连接 DevTools 失败: {e}")
+        self.closed = False
+        threading.Thread(target=self._read_loop, name="leaflow-cdp-reader", daemon=True).start()
+        logger.info(f"已通过 DevTools 协议启动 Chrome: {binary}")
+    
+    def _read_loop(self):
+        """接收响应和事件：响应交给等待的命令，事件分发给各页面"""
+        while True:
+            try:
+                message = json.loads(self.ws.recv())
+            except Exception:
+                break
+            if 'id' in message:
+                with self._lock:
+                    waiter = self._pending.pop(message['id'], None)
+                if waiter:
+                    waiter[1] = message
+                    waiter[0].set()
+            else:
+                for listener in list(self._listeners):
+                    listener(message.get('sessionId'), message.get('method'), message.get('params', {}))
+        with self._lock:
+            self.closed = True
+            pending, self._pending = list(self._pending.values()), {}
+        for waiter in pending:
+            waiter[0].set()
+    
+    def send(self, method, params=None, session_id=None, timeout=30):
+        """发送命令并等待结果"""
+        waiter = [threading.Event(), None]
+        with self._lock:
+            if self.closed:
+                raise CdpEngineError("DevTools 连接已断开")
+            self._next_id += 1
+            message_id = self._next_id
+            self._pending[message_id] = waiter
+            message = {'id': message_id, 'method': method, 'params': params or {}}
+            if session_id:
+                message['sessionId'] = session_id
+            self.ws.send(json.dumps(message))
+        if not waiter[0].wait(timeout):
+            with self._lock:
+                self._pending.pop(message_id, None)
+            raise CdpEngineError(f"{method} 超时")
+        response = waiter[1]
+        if response is None:
+            raise CdpEngineError("DevTools 连接已断开")
+        if 'error' in response:
+            # 页面会话中的命令出错（例如导航中执行上下文已销毁）属于页面级错误
+            error_type = CdpPageError if session_id else CdpEngineError
+            raise error_type(f"{method}: {response['error'].get('message')}")
+        return response.get('result', {})
+    
+    def add_listener(self, listener):
+        self._listeners.append(listener)
+    
+    def remove_listener(self, listener):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+    
+    def is_alive(self):
+        return not self.closed and self.process is not None and self.process.poll() is None
+    
+    def running(self):
+        return self.process is not None
+    
+    def new_page(self):
+        """在新的浏览器上下文中打开空白页，浏览器未启动或已崩溃时先（重新）启动"""
+        if not self.is_alive():
+            self.quit()
+            self.launch()
+        context_id = self.send('Target.createBrowserContext')['browserContextId']
+        target_id = self.send('Target.createTarget', {'url': 'about:blank', 'browserContextId': context_id})['targetId']
+        session_id = self.send('Target.attachToTarget', {'targetId': target_id, 'flatten': True})['sessionId']
+        page = CdpPage(self, session_id, context_id)
+        page.setup()
+        return page
+    
+    def rss_mb(self):
+        try:
+            return process_tree_rss(self.process.pid)
+        except Exception:
+            return 0
+    
+    def quit(self):
+        if self.ws is not None:
+            try:
+                self.send('Browser.close', timeout=5)
+            except CdpEngineError:
+                pass
+            try:
+                self.ws.close()
+            except Exception:
+                pass
+            self.ws = None
+        elif self.process is not None:
+            self.process.terminate()
+        if self.process is not None:
+            try:
+                self.process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+            self.process = None
+        if self.user_data_dir:
+            shutil.rmtree(self.user_data_dir, ignore_errors=True)
+            self.user_data_dir = None
+        self.closed = True
+
+class CdpPage:
+    """CdpBrowser 中的一个页面，提供签到流程用到的导航、查询、点击、输入、执行脚本和等待操作
+    
+    导航完成和网络空闲都根据 DevTools 事件判断，不需要轮询。
+    """
+    
+    # 长连接请求不会结束，不计入网络空闲判断
+    LONG_LIVED_TYPES = ('EventSource', 'WebSocket')
+    
+    def __init__(self, browser, session_id, context_id):
+        self.browser = browser
+        self.session_id = session_id
+        self.context_id = context_id
+        self.frame_id = None
+        # 已收到的主框架生命周期事件 (loaderId, 事件名)
+        self.lifecycle = set()
+        self.inflight = set()
+        self.last_activity = time.monotonic()
+        self._cond = threading.Condition()
+        browser.add_listener(self._on_event)
+    
+    def _on_event(self, session_id, method, params):
+        if session_id != self.session_id:
+            return
+        with self._cond:
+            if method == 'Page.lifecycleEvent' and params.get('frameId') == self.frame_id:
+                self.lifecycle.add((params.get('loaderId'), params.get('name')))
+            elif method == 'Network.requestWillBeSent':
+                if params.get('type') not in self.LONG_LIVED_TYPES:
+                    self.inflight.add(params['requestId'])
+            elif method in ('Network.loadingFinished', 'Network.loadingFailed'):
+                self.inflight.discard(params['requestId'])
+            else:
+                return
+            if method.startswith('Network.'):
+                self.last_activity = time.monotonic()
+            self._cond.notify_all()
+    
+    def send(self, method, params=None, timeout=30):
+        return self.browser.send(method, params, self.session_id, timeout)
+    
+    # 与 Selenium driver 同名，导出 Cookie 等 CDP 调用可以共用
+    execute_cdp_cmd = send
+    
+    def setup(self):
+        self.send('Page.enable')
+        self.send('Network.enable')
+        self.send('Page.setLifecycleEventsEnabled', {'enabled': True})
+        self.frame_id = self.send('Page.getFrameTree')['frameTree']['frame']['id']
+        self.send('Page.addScriptToEvaluateOnNewDocument', {'source': HIDE_WEBDRIVER_SCRIPT})
+        patterns = blocked_url_patterns() if BLOCK_RESOURCES else []
+        if patterns:
+            self.send('Network.setBlockedURLs', {'urls': patterns})
+    
+    def _wait_state(self, predicate, timeout):
+        """在事件到达时检查 predicate，超时返回 False"""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while not predicate():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            return True
+    
+    def navigate(self, url, timeout=None):
+        """打开页面并等待主框架的 load 事件"""
+        timeout = wait_timeout('page_ready') if timeout is None else timeout
+        result = self.send('Page.navigate', {'url': url, 'frameId': self.frame_id})
+        if result.get('errorText'):
+            raise CdpPageError(f"打开 {url} 失败: {result['errorText']}")
+        loader_id = result.get('loaderId')
+        if loader_id and not self._wait_state(lambda: (loader_id, 'load') in self.lifecycle, timeout):
+            logger.warning(f"页面在 {timeout} 秒内未加载完成")
+    
+    def wait_for_network_idle(self, timeout=None, idle_time=NETWORK_IDLE_TIME):
+        """等待没有进行中的请求且 idle_time 秒内没有新的网络事件"""
+        timeout = wait_timeout('network_idle') if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                quiet = now - self.last_activity
+                if not self.inflight and quiet >= idle_time:
+                    return True
+                if now >= deadline:
+                    logger.warning(f"网络在 {timeout} 秒内未空闲")
+                    return False
+                self._cond.wait(min(deadline - now, max(idle_time - quiet, 0.05)))
+    
+    def evaluate(self, script, *args):
+        """与 execute_script 相同的写法：脚本中使用 arguments 和 return"""
+        expression = f"(function () {{ {script} }}).apply(null, {json.dumps(list(args))})"
+        result = self.send('Runtime.evaluate', {
+            'expression': expression,
+            'returnByValue': True,
+            'awaitPromise': True,
+        })
+        if 'exceptionDetails' in result:
+            details = result['exceptionDetails']
+            raise CdpPageError(details.get('exception', {}).get('description') or details.get('text'))
+        return result.get('result', {}).get('value')
+    
+    def current_url(self):
+        return self.evaluate("return location.href")
+    
+    def wait(self, condition, timeout, poll_frequency=0.2):
+        """轮询 condition 直到返回真值，页面跳转期间的脚本错误会被忽略，超时返回 None"""
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                value = condition()
+                if value:
+                    return value
+            except CdpPageError:
+                pass
+            if time.monotonic() >= deadline:
+                return None
+            time.sleep(poll_frequency)
+    
+    def query(self, selectors, clickable=False):
+        """返回第一个可见元素的信息（选择器、文本、状态、中心坐标），没有则返回 None"""
+        return self.evaluate(ELEMENT_SCRIPT, list(selectors), clickable)
+    
+    def wait_for(self, tiers, timeout, clickable=False):
+        """等待分层的选择器，与 any_of_visible 相同，通用的层晚一些参与匹配"""
+        start = time.monotonic()
+        return self.wait(lambda: self.query(eligible_selectors(tiers, time.monotonic() - start), clickable), timeout)
+    
+    def click_at(self, x, y):
+        """在视口坐标处模拟一次鼠标左键点击"""
+        self.send('Input.dispatchMouseEvent', {'type': 'mouseMoved', 'x': x, 'y': y})
+        for event_type in ('mousePressed', 'mouseReleased'):
+            self.send('Input.dispatchMouseEvent', {
+                'type': event_type, 'x': x, 'y': y, 'button': 'left', 'clickCount': 1,
+            })
+    
+    def click(self, element):
+        self.click_at(element['x'], element['y'])
+    
+    def type(self, selectors, text):
+        """点击第一个可见的输入框获得焦点后输入文本"""
+        element = self.query(selectors, clickable=True)
+        if not element:
+            raise CdpPageError(f"找不到输入框: {selectors}")
+        self.click(element)
+        self.send('Input.insertText', {'text': text})
+        return element['selector']
+    
+    def close(self):
+        self.browser.remove_listener(self._on_event)
+        try:
+            self.browser.send('Target.disposeBrowserContext', {'browserContextId': self.context_id})
+        except CdpEngineError:
+            pass
+
+class LeaflowCdpCheckin:
+    """通过 CdpPage 完成登录和签到，流程与 LeaflowAutoCheckin 相同
+    
+    页面级错误按普通失败返回；点击签到之前出现引擎异常时抛出 CdpEngineError 回退到 Selenium。
+    """
+    
+    def __init__(self, email, password, page):
+        self.email = email
+        self.password = password
+        self.page = page
+        # 已点击签到按钮后不再回退，避免重复登录和签到
+        self.clicked = False
+    
+    def login(self):
+        logger.info("[CDP] 开始登录流程")
+        self.page.navigate(LOGIN_URL)
+        
+        # 关闭初始弹窗：点击页面左上角空白处
+        if self.page.wait(lambda: self.page.evaluate(POPUP_SCRIPT), wait_timeout('popup')):
+            self.page.click_at(10, 10)
+            logger.info("[CDP] 已关闭弹窗")
+        self.page.wait_for_network_idle()
+        
+        # 一次脚本调用同时填写邮箱和密码，部分页面在输入邮箱后才显示密码框
+        email_filled, password_filled = self.page.evaluate(
+            FILL_FIELDS_SCRIPT, [
+                [eligible_selectors(EMAIL_SELECTORS, float('inf')), self.email],
+                [eligible_selectors(PASSWORD_SELECTORS, float('inf')), self.password],
+            ]
+        )
+        if not email_filled:
+            raise Exception("找不到邮箱输入框")
+        if not password_filled and not self.page.wait(
+            lambda: self.page.evaluate(FILL_FIELDS_SCRIPT, [[eligible_selectors(PASSWORD_SELECTORS, float('inf')), self.password]])[0],
+            wait_timeout('element'),
+        ):
+            raise Exception("找不到密码输入框")
+        logger.info("[CDP] 邮箱和密码输入完成")
+        
+        button = self.page.wait_for(LOGIN_BUTTON_SELECTORS, wait_timeout('element'), clickable=True)
+        if not button:
+            raise Exception("找不到登录按钮")
+        self.page.click(button)
+        logger.info(f"[CDP] 已点击登录按钮: {button['selector']}")
+        
+        def logged_in_url():
+            url = self.page.current_url()
+            return url if "dashboard" in url or "workspaces" in url or "login" not in url else None
+        
+        current_url = self.page.wait(logged_in_url, wait_timeout('url_change'))
+        if current_url:
+            logger.info(f"[CDP] 登录成功，当前URL: {current_url}")
+            return True
+        messages = self.page.evaluate(PAGE_STATE_SCRIPT, LOGIN_ERROR_SELECTORS, "button[type='submit']", [])['messages']
+        if messages:
+            raise Exception(f"登录失败: {messages[0]['text']}")
+        raise Exception("登录超时，无法确认登录状态")
+    
+    def checkin(self):
+        logger.info("[CDP] 跳转到签到页面...")
+        self.page.navigate(CHECKIN_URL)
+        self.page.wait_for_network_idle()
+        if not self.page.wait_for(CHECKIN_INDICATORS, wait_timeout('page_ready')):
+            raise Exception("签到页面加载失败，无法找到签到相关元素")
+        
+        button = self.page.wait_for(CHECKIN_BUTTON_SELECTORS, wait_timeout('element'))
+        if not button:
+            raise Exception("找不到签到按钮")
+        if "已签到" in button['text'] or button['disabled']:
+            logger.info("伙计，今日你已经签到过了！")
+            return "今天你已经签到过了！"
+        self.clicked = True
+        self.page.click(button)
+        logger.info("[CDP] 已点击立即签到按钮")
+        
+        text = self.page.wait(lambda: self.page.evaluate(TOAST_SCRIPT, RESULT_SELECTORS), wait_timeout('toast'))
+        if text:
+            return text
+        return checkin_result_from_state(
+            self.page.evaluate(PAGE_STATE_SCRIPT, RESULT_SELECTORS, "button.checkin-btn", RESULT_KEYWORDS)
+        )
+    
+    def run(self):
+        """单个账号执行流程，点击签到前 CDP 引擎异常时抛出 CdpEngineError"""
+        try:
+            self.login()
+            result = self.checkin()
+            logger.info(f"[CDP] 签到结果: {result}")
+            return True, result
+        except CdpEngineError:
+            if not self.clicked:
+                raise
+            error_msg = "自动签到失败: 点击签到后 CDP 连接中断，签到结果未知"
+            logger.error(error_msg)
+            return False, error_msg
+        except Exception as e:
+            error_msg = f"自动签到失败: {str(e)}"
+            logger.error(error_msg)
+            return False, error_msg
+
 class MultiAccountManager:
     """多账号管理器 - 简化配置版本"""
     
@@ -427,6 +2257,10 @@ class MultiAccountManager:
         self.telegram_bot_token = os.getenv('TELEGRAM_BOT_TOKEN', '')
         self.telegram_chat_id = os.getenv('TELEGRAM_CHAT_ID', '')
         self.accounts = self.load_accounts()
+        self.session_store = SessionStore(SESSION_FILE, SESSION_TTL)
+        # 各账号的 WebDriver 耗时分析结果
+        self.profiles = []
+        self.profile_lock = threading.Lock()
     
     def load_accounts(self):
         """从环境变量加载多账号信息，支持冒号分隔多账号和单账号"""
@@ -524,30 +2358,131 @@ class MultiAccountManager:
         except Exception as e:
             logger.error(f"发送Telegram通知时出错: {e}")
     
+    def decide_workers(self):
+        """根据配置、可用内存和 CPU 核数决定并行的浏览器数量"""
+        if WORKERS != 'auto':
+            return max(1, min(int(WORKERS), len(self.accounts)))
+        _, available_mb = read_meminfo()
+        by_memory = int(available_mb * 0.8 // BROWSER_MEMORY_MB) if available_mb else 1
+        workers = max(1, min(os.cpu_count() or 1, by_memory, len(self.accounts)))
+        logger.info(f"自动并行数: {workers}（CPU {os.cpu_count()} 核，可用内存 {available_mb}MB）")
+        return workers
+    
+    def memory_limit(self):
+        if MEMORY_LIMIT_MB:
+            return int(MEMORY_LIMIT_MB)
+        _, available_mb = read_meminfo()
+        return int(available_mb * 0.8) if available_mb else None
+    
+    def run_account(self, account, browser=None, governor=None, cdp_browser=None):
+        """处理单个账号：优先纯 HTTP 签到，需要时回退到浏览器"""
+        if HTTP_FIRST:
+            try:
+                return LeaflowHttpCheckin(account['email'], account['password']).run()
+            except HttpFlowFallback as e:
+                logger.warning(f"HTTP 签到不可用，回退到浏览器: {e}")
+        if ENGINE == 'cdp':
+            try:
+                return self.run_account_cdp(account, cdp_browser, governor)
+            except CdpEngineError as e:
+                logger.warning(f"CDP 引擎不可用，回退到 Selenium: {e}")
+        driver = None
+        if browser:
+            driver = browser.acquire()
+        auto_checkin = LeaflowAutoCheckin(account['email'], account['password'], driver, self.session_store)
+        try:
+            return auto_checkin.run()
+        finally:
+            if auto_checkin.profiler:
+                with self.profile_lock:
+                    self.profiles.append(auto_checkin.profiler.report())
+    
+    def run_account_cdp(self, account, cdp_browser=None, governor=None):
+        """在 CDP 引擎的独立浏览器上下文中处理账号，未传入 cdp_browser 时临时启动一个
+        
+        传入 governor 时启动浏览器前先等待内存允许；不复用浏览器时每个账号结束后关闭。
+        """
+        owns_browser = cdp_browser is None
+        cdp_browser = cdp_browser or CdpBrowser()
+        if governor and not cdp_browser.is_alive():
+            cdp_browser.quit()
+            governor.released()
+            with governor.admit():
+                cdp_browser.launch()
+        page = None
+        try:
+            page = cdp_browser.new_page()
+            return LeaflowCdpCheckin(account['email'], account['password'], page).run()
+        finally:
+            if page:
+                page.close()
+            if owns_browser or not REUSE_BROWSER:
+                cdp_browser.quit()
+                if governor:
+                    governor.released()
+    
+    def run_parallel(self, workers):
+        """多个浏览器并行处理账号，结果按账号顺序返回"""
+        limit_mb = self.memory_limit()
+        logger.info(f"并行执行，{workers} 个浏览器，内存上限 {limit_mb or '不限'}MB")
+        governor = MemoryGovernor(limit_mb)
+        tasks = queue.Queue()
+        for index, account in enumerate(self.accounts):
+            tasks.put((index, account))
+        results = [None] * len(self.accounts)
+        
+        def worker():
+            browser = SharedBrowser(BROWSER_RESTART_EVERY if REUSE_BROWSER else 1, governor)
+            governor.register(browser)
+            # CDP 引擎的浏览器同样计入内存上限，不复用时由 run_account_cdp 在每个账号后关闭
+            cdp_browser = CdpBrowser() if ENGINE == 'cdp' else None
+            if cdp_browser:
+                governor.register(cdp_browser)
+            try:
+                while True:
+                    try:
+                        index, account = tasks.get_nowait()
+                    except queue.Empty:
+                        return
+                    logger.info(f"处理第 {index + 1}/{len(self.accounts)} 个账号")
+                    try:
+                        success, result = self.run_account(account, browser, governor, cdp_browser)
+                        results[index] = (account['email'], success, result)
+                    except Exception as e:
+                        error_msg = f"处理账号时发生异常: {str(e)}"
+                        logger.error(error_msg)
+                        results[index] = (account['email'], False, error_msg)
+                    governor.usage()
+            finally:
+                browser.quit()
+                if cdp_browser:
+                    cdp_browser.quit()
+                governor.released()
+        
+        threads = [threading.Thread(target=worker, name=f"leaflow-{i + 1}") for i in range(workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        logger.info(f"浏览器内存峰值: {governor.peak_mb}MB")
+        return results
+    
     def run_all(self):
         """运行所有账号的签到流程"""
         logger.info(f"开始执行 {len(self.accounts)} 个账号的签到任务")
         
-        results = []
+        workers = self.decide_workers()
+        if workers > 1:
+            results = self.run_parallel(workers)
+        else:
+            results = self.run_sequential()
         
-        for i, account in enumerate(self.accounts, 1):
-            logger.info(f"处理第 {i}/{len(self.accounts)} 个账号")
-            
-            try:
-                auto_checkin = LeaflowAutoCheckin(account['email'], account['password'])
-                success, result = auto_checkin.run()
-                results.append((account['email'], success, result))
-                
-                # 在账号之间添加间隔，避免请求过于频繁
-                if i < len(self.accounts):
-                    wait_time = 5
-                    logger.info(f"等待{wait_time}秒后处理下一个账号...")
-                    time.sleep(wait_time)
-                    
-            except Exception as e:
-                error_msg = f"处理账号时发生异常: {str(e)}"
-                logger.error(error_msg)
-                results.append((account['email'], False, error_msg))
+        selector_registry.report()
+        selector_registry.save()
+        self.session_store.save()
+        driver_resolver.report()
+        if PROFILE_FILE and self.profiles:
+            CommandProfiler.write(PROFILE_FILE, self.profiles)
         
         # 发送汇总通知
         self.send_notification(results)
@@ -555,6 +2490,37 @@ class MultiAccountManager:
         # 返回总体结果
         success_count = sum(1 for _, success, _ in results if success)
         return success_count == len(self.accounts), results
+    
+    def run_sequential(self):
+        """顺序处理账号"""
+        results = []
+        shared_browser = SharedBrowser() if REUSE_BROWSER else None
+        cdp_browser = CdpBrowser() if ENGINE == 'cdp' and REUSE_BROWSER else None
+        
+        try:
+            for i, account in enumerate(self.accounts, 1):
+                logger.info(f"处理第 {i}/{len(self.accounts)} 个账号")
+                
+                try:
+                    success, result = self.run_account(account, shared_browser, cdp_browser=cdp_browser)
+                    results.append((account['email'], success, result))
+                    
+                    # 在账号之间添加间隔，避免请求过于频繁
+                    if i < len(self.accounts):
+                        wait_time = 5
+                        logger.info(f"等待{wait_time}秒后处理下一个账号...")
+                        time.sleep(wait_time)
+                        
+                except Exception as e:
+                    error_msg = f"处理账号时发生异常: {str(e)}"
+                    logger.error(error_msg)
+                    results.append((account['email'], False, error_msg))
+        finally:
+            if shared_browser:
+                shared_browser.quit()
+            if cdp_browser:
+                cdp_browser.quit()
+        return results
 
 def main():
     """主函数"""
@@ -0,0 +1,392 @@
+#!/usr/bin/env python3
+"""
+Leaflow 本地测试站点
+模拟 leaflow.net 的登录页（含初始弹窗）和 checkin.leaflow.net 的签到页（button.checkin-btn + 结果提示），
+用于离线测试和基准测试浏览器签到流程。两个站点使用同一主机的不同端口，Cookie 共享、源不同，与线上一致。
+
+用法：python leaflow_fixture.py
+启动后按提示设置 LEAFLOW_BASE_URL / LEAFLOW_CHECKIN_URL 即可让 leaflow_checkin.py 访问本地站点
+
+可配置的环境变量：
+FIXTURE_HOST / FIXTURE_PORT：监听地址和登录站点端口，签到站点使用 端口+1，端口为 0 时自动分配
+FIXTURE_PASSWORD：允许登录的密码，为空时任意非空密码都可以登录
+FIXTURE_PAGE_DELAY：每个页面响应前的延迟（秒）
+FIXTURE_RENDER_DELAY：页面主体由脚本延迟渲染的时间（秒），模拟前端框架加载
+FIXTURE_POPUP_DELAY：登录页弹窗出现的延迟（秒），为负数时不显示弹窗
+FIXTURE_CHECKIN_DELAY：签到接口的处理延迟（秒）
+FIXTURE_TOAST_DELAY：签到成功后结果提示出现的延迟（秒）
+FIXTURE_SIGNED_IN：今天已经签到过的账号，all 表示全部，或用逗号分隔的邮箱
+FIXTURE_VARIANT：页面选择器变体，default 或 alt（邮箱框 type=email、登录按钮为 input、签到按钮没有 checkin-btn 类）
+FIXTURE_TWO_STEP：1 表示输入邮箱后才显示密码框
+FIXTURE_NO_FORM：1 表示签到页没有表单，签到按钮只通过脚本提交（脚本中含“已签到”文本），纯 HTTP 流程应回退到浏览器
+"""
+
+import os
+import json
+import time
+import secrets
+import logging
+import threading
+from html import escape
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from http.cookies import SimpleCookie
+from urllib.parse import parse_qs, urlsplit
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+SESSION_COOKIE = 'fixture_session'
+CSRF_TOKEN = 'fixture-csrf-token'
+
+LOGIN_PAGE = """<!DOCTYPE html>
+<html lang="zh-CN">
+<head>
+<meta charset="utf-8">
+<meta name="csrf-token" content="{csrf}">
+<title>登录 - Leaflow</title>
+<style>
+  body {{ font-family: sans-serif; margin: 0; }}
+  main {{ width: 360px; margin: 120px auto; }}
+  input, button {{ display: block; width: 100%; margin: 12px 0; padding: 8px; box-sizing: border-box; }}
+  .hidden {{ display: none; }}
+  .el-overlay {{ position: fixed; inset: 0; background: rgba(0, 0, 0, .5); z-index: 10; }}
+  .el-dialog {{ width: 400px; margin: 200px auto; padding: 24px; background: #fff; }}
+</style>
+</head>
+<body>
+<div id="app"></div>
+<template id="page">
+  <main>
+    <h1>登录</h1>
+    {error}
+    <form id="login-form" method="post" action="/login">
+      <input type="hidden" name="_token" value="{csrf}">
+      {email_input}
+      <input type="password" name="password" placeholder="密码" class="{password_class}">
+      {login_button}
+    </form>
+  </main>
+</template>
+<script>
+  const render = () => {{
+    document.getElementById('app').appendChild(document.getElementById('page').content.cloneNode(true));
+    const email = document.querySelector('input[name="email"]');
+    const password = document.querySelector('input[name="password"]');
+    email.addEventListener('input', () => {{ if (email.value) password.classList.remove('hidden'); }});
+  }};
+  const showPopup = () => {{
+    const overlay = document.createElement('div');
+    overlay.className = 'el-overlay';
+    overlay.innerHTML = '<div class="el-dialog" role="dialog"><h3>公告</h3><p>欢迎使用 Leaflow</p></div>';
+    overlay.addEventListener('click', event => {{ if (event.target === overlay) overlay.remove(); }});
+    document.body.appendChild(overlay);
+  }};
+  setTimeout(render, {render_delay});
+  if ({popup_delay} >= 0) setTimeout(showPopup, {popup_delay});
+</script>
+</body>
+</html>
+"""
+
+DASHBOARD_PAGE = """<!DOCTYPE html>
+<html lang="zh-CN">
+<head><meta charset="utf-8"><title>控制台 - Leaflow</title></head>
+<body><main><h1>控制台</h1><p>{email}</p><a href="{checkin_url}">每日签到</a></main></body>
+</html>
+"""
+
+CHECKIN_PAGE = """<!DOCTYPE html>
+<html lang="zh-CN">
+<head>
+<meta charset="utf-8">
+<meta name="csrf-token" content="{csrf}">
+<title>每日签到 - Leaflow</title>
+<style>
+  .el-message {{ position: fixed; top: 20px; left: 50%; padding: 12px 24px; background: #f0f9eb; }}
+</style>
+</head>
+<body>
+<div id="app"></div>
+<template id="page">
+  <main>
+    <h1>每日签到</h1>
+    <p>连续签到可获得额外奖励</p>
+    {checkin_body}
+  </main>
+</template>
+<script>
+  const render = () => {{
+    document.getElementById('app').appendChild(document.getElementById('page').content.cloneNode(true));
+    const form = document.getElementById('checkin-form');
+    const button = document.querySelector('main button');
+    // 没有表单时点击按钮直接提交
+    const submit = async event => {{
+      event.preventDefault();
+      button.disabled = true;
+      const body = form ? new URLSearchParams(new FormData(form)) : new URLSearchParams({{_token: '{csrf}', checkin: ''}});
+      const response = await fetch('/checkin', {{
+        method: 'POST',
+        body: body,
+        headers: {{'Accept': 'application/json', 'X-CSRF-TOKEN': '{csrf}'}},
+      }});
+      const result = await response.json();
+      setTimeout(() => {{
+        const toast = document.createElement('div');
+        toast.className = 'el-message';
+        toast.textContent = result.message;
+        document.body.appendChild(toast);
+        button.textContent = '已签到';
+      }}, {toast_delay});
+    }};
+    if (form) form.addEventListener('submit', submit);
+    else button.addEventListener('click', submit);
+  }};
+  setTimeout(render, {render_delay});
+</script>
+</body>
+</html>
+"""
+
+CHECKIN_RESULT_PAGE = """<!DOCTYPE html>
+<html lang="zh-CN">
+<head><meta charset="utf-8"><title>每日签到 - Leaflow</title></head>
+<body><div class="alert-success">{message}</div></body>
+</html>
+"""
+
+
+class FixtureConfig:
+    """测试站点配置，默认值从环境变量读取"""
+
+    def __init__(self, **overrides):
+        self.host = os.getenv('FIXTURE_HOST', '127.0.0.1')
+        self.port = int(os.getenv('FIXTURE_PORT', '8800'))
+        self.password = os.getenv('FIXTURE_PASSWORD', '')
+        self.page_delay = float(os.getenv('FIXTURE_PAGE_DELAY', '0'))
+        self.render_delay = float(os.getenv('FIXTURE_RENDER_DELAY', '0.3'))
+        self.popup_delay = float(os.getenv('FIXTURE_POPUP_DELAY', '0.5'))
+        self.checkin_delay = float(os.getenv('FIXTURE_CHECKIN_DELAY', '0.2'))
+        self.toast_delay = float(os.getenv('FIXTURE_TOAST_DELAY', '0.3'))
+        self.signed_in = os.getenv('FIXTURE_SIGNED_IN', '')
+        self.variant = os.getenv('FIXTURE_VARIANT', 'default')
+        self.two_step = os.getenv('FIXTURE_TWO_STEP', '0') == '1'
+        self.no_form = os.getenv('FIXTURE_NO_FORM', '0') == '1'
+        for name, value in overrides.items():
+            if not hasattr(self, name):
+                raise ValueError(f"未知配置: {name}")
+            setattr(self, name, value)
+
+
+class FixtureState:
+    """登录会话和签到记录"""
+
+    def __init__(self, config):
+        self.config = config
+        self.sessions = {}
+        self.checked_in = set()
+        if config.signed_in and config.signed_in != 'all':
+            self.checked_in.update(email.strip() for email in config.signed_in.split(',') if email.strip())
+        self.counters = {'login': 0, 'checkin': 0}
+        self._lock = threading.Lock()
+
+    def login(self, email, password):
+        """校验账号并返回会话 token，失败返回 None"""
+        if not email or not password or (self.config.password and password != self.config.password):
+            return None
+        token = secrets.token_hex(16)
+        with self._lock:
+            self.sessions[token] = email
+            self.counters['login'] += 1
+        return token
+
+    def email_for(self, token):
+        with self._lock:
+            return self.sessions.get(token)
+
+    def is_checked_in(self, email):
+        with self._lock:
+            return self.config.signed_in == 'all' or email in self.checked_in
+
+    def checkin(self, email):
+        """签到并返回结果消息"""
+        with self._lock:
+            if self.config.signed_in == 'all' or email in self.checked_in:
+                return "今天已经签到过了"
+            self.checked_in.add(email)
+            self.counters['checkin'] += 1
+        return "签到成功，获得 1 积分"
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    """两个站点共用的请求处理，site 为 'login' 或 'checkin'"""
+
+    site = None
+    fixture = None
+
+    def log_message(self, format, *args):
+        logger.debug(f"[{self.site}] {format % args}")
+
+    @property
+    def config(self):
+        return self.fixture.config
+
+    def current_email(self):
+        cookie = SimpleCookie(self.headers.get('Cookie', ''))
+        morsel = cookie.get(SESSION_COOKIE)
+        return self.fixture.state.email_for(morsel.value) if morsel else None
+
+    def read_form(self):
+        length = int(self.headers.get('Content-Length', 0))
+        body = self.rfile.read(length).decode('utf-8')
+        return {key: values[0] for key, values in parse_qs(body).items()}
+
+    def send(self, status, body='', content_type='text/html; charset=utf-8', headers=None):
+        data = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def redirect(self, location, headers=None):
+        self.send(302, headers=dict(headers or {}, Location=location))
+
+    def do_GET(self):
+        time.sleep(self.config.page_delay)
+        path = urlsplit(self.path).path
+        if self.site == 'login':
+            if path == '/login':
+                return self.send(200, self.fixture.login_page())
+            if path in ('/', '/dashboard'):
+                email = self.current_email()
+                if not email:
+                    return self.redirect(f"{self.fixture.login_url}/login")
+                return self.send(200, DASHBOARD_PAGE.format(email=escape(email), checkin_url=self.fixture.checkin_url))
+        elif path == '/':
+            email = self.current_email()
+            if not email:
+                return self.redirect(f"{self.fixture.login_url}/login")
+            return self.send(200, self.fixture.checkin_page(email))
+        self.send(404, 'Not Found', 'text/plain; charset=utf-8')
+
+    def do_POST(self):
+        path = urlsplit(self.path).path
+        form = self.read_form()
+        if self.site == 'login' and path == '/login':
+            time.sleep(self.config.page_delay)
+            token = self.fixture.state.login(form.get('email', ''), form.get('password', ''))
+            if not token:
+                return self.send(200, self.fixture.login_page(error="邮箱或密码错误"))
+            cookie = f"{SESSION_COOKIE}={token}; Path=/; HttpOnly; SameSite=Lax"
+            return self.redirect('/dashboard', {'Set-Cookie': cookie})
+        if self.site == 'checkin' and path == '/checkin':
+            email = self.current_email()
+            if not email:
+                return self.send(401, json.dumps({'message': '请先登录'}), 'application/json')
+            time.sleep(self.config.checkin_delay)
+            message = self.fixture.state.checkin(email)
+            if 'application/json' in self.headers.get('Accept', ''):
+                return self.send(200, json.dumps({'message': message}, ensure_ascii=False), 'application/json')
+            return self.send(200, CHECKIN_RESULT_PAGE.format(message=message))
+        self.send(404, 'Not Found', 'text/plain; charset=utf-8')
+
+
+class LeaflowFixture:
+    """在后台线程中运行登录站点和签到站点"""
+
+    def __init__(self, config=None):
+        self.config = config or FixtureConfig()
+        self.state = FixtureState(self.config)
+        self.servers = []
+
+    @property
+    def login_url(self):
+        return f"http://{self.config.host}:{self.servers[0].server_address[1]}"
+
+    @property
+    def checkin_url(self):
+        return f"http://{self.config.host}:{self.servers[1].server_address[1]}"
+
+    def environ(self):
+        """让 leaflow_checkin.py 访问本地站点的环境变量"""
+        return {
+            'LEAFLOW_BASE_URL': self.login_url,
+            'LEAFLOW_LOGIN_URL': f"{self.login_url}/login",
+            'LEAFLOW_CHECKIN_URL': self.checkin_url,
+        }
+
+    def login_page(self, error=None):
+        alt = self.config.variant == 'alt'
+        if alt:
+            email_input = '<input type="email" name="email" placeholder="email">'
+            login_button = '<input type="submit" value="登录">'
+        else:
+            email_input = '<input type="text" name="email" placeholder="邮箱">'
+            login_button = '<button type="submit">登录</button>'
+        return LOGIN_PAGE.format(
+            csrf=CSRF_TOKEN,
+            error=f'<div class="alert-danger">{error}</div>' if error else '',
+            email_input=email_input,
+            password_class='hidden' if self.config.two_step else '',
+            login_button=login_button,
+            render_delay=int(self.config.render_delay * 1000),
+            popup_delay=int(self.config.popup_delay * 1000),
+        )
+
+    def checkin_page(self, email):
+        css_class = 'btn btn-primary' if self.config.variant == 'alt' else 'checkin-btn'
+        if self.state.is_checked_in(email):
+            button = f'<button type="submit" class="{css_class} disabled" disabled>已签到</button>'
+        else:
+            button = f'<button type="submit" name="checkin" class="{css_class}">立即签到</button>'
+        if self.config.no_form:
+            body = button.replace('type="submit"', 'type="button"')
+        else:
+            body = (
+                '<form id="checkin-form" method="post" action="/checkin">'
+                f'<input type="hidden" name="_token" value="{CSRF_TOKEN}">{button}</form>'
+            )
+        return CHECKIN_PAGE.format(
+            csrf=CSRF_TOKEN,
+            checkin_body=body,
+            render_delay=int(self.config.render_delay * 1000),
+            toast_delay=int(self.config.toast_delay * 1000),
+        )
+
+    def reset(self):
+        """清空登录会话和签到记录，同一个站点可以跑多轮基准"""
+        self.state = FixtureState(self.config)
+
+    def start(self):
+        ports = (self.config.port, self.config.port + 1 if self.config.port else 0)
+        for site, port in zip(('login', 'checkin'), ports):
+            handler = type(f'{site.title()}Handler', (FixtureHandler,), {'site': site, 'fixture': self})
+            server = ThreadingHTTPServer((self.config.host, port), handler)
+            server.daemon_threads = True
+            threading.Thread(target=server.serve_forever, name=f"fixture-{site}", daemon=True).start()
+            self.servers.append(server)
+        return self
+
+    def stop(self):
+        for server in self.servers:
+            server.shutdown()
+            server.server_close()
+        self.servers = []
+
+
+def main():
+    fixture = LeaflowFixture().start()
+    logger.info(f"登录站点: {fixture.login_url}/login")
+    logger.info(f"签到站点: {fixture.checkin_url}")
+    for name, value in fixture.environ().items():
+        print(f"export {name}={value}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        fixture.stop()
+
+
+if __name__ == "__main__":
+    main()
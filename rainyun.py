@@ -4,7 +4,7 @@
 """
 Rainyun（雨云）每日签到，Python 版
 - 多账号支持
-- 顺序或并发执行（通过 MODE）
+- 顺序、并发或异步执行（通过 MODE）
 - 发送 Telegram 推送（可选）
 """
 
@@ -12,10 +12,16 @@ import os
 import sys
 import json
 import time
+import asyncio
+import queue
 import random
 import logging
+import threading
 import traceback
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from urllib.parse import urlsplit
 
 import requests
 
@@ -29,10 +35,39 @@ logging.basicConfig(
 )
 log = logging.getLogger("Rainyun")
 
-# 并发/顺序模式 1=顺序 2=并发
+# 并发/顺序模式 1=顺序 2=并发 3=异步
 MODE = int(os.getenv("MODE", "1"))
-# 并发最大数（仅在 MODE==2 时使用）
+# 并发最大数（MODE==2 为线程数，MODE==3 为同时进行的请求数）
 RUN_MAX = int(os.getenv("RUN_MAX", "3"))
+# MODE==2 自适应并发 1=开启 0=关闭（默认）：以 RUN_MAX 为起点，请求正常时逐步增加，
+# 遇到限流、超时、5xx 或持续的延迟升高时减半，在 1 ~ RUN_MAX_LIMIT 之间调整
+ADAPTIVE = os.getenv("ADAPTIVE", "0") == "1"
+# 自适应并发的上限，默认为 RUN_MAX 的 2 倍（只在 ADAPTIVE=1 时生效）
+RUN_MAX_LIMIT = int(os.getenv("RUN_MAX_LIMIT", str(RUN_MAX * 2)))
+
+# 滑块验证码服务地址（可替换为本地服务用于测试）
+CAPTCHA_URL = os.getenv("CAPTCHA_URL", "https://txdx.vvvcx.me/solve_captcha?aid=2039519451&type=1")
+# 是否在加载账号后立即预取验证码 ticket 1=开启 0=关闭
+CAPTCHA_PREFETCH = os.getenv("CAPTCHA_PREFETCH", "1") == "1"
+# 预取队列容量、预取线程数、ticket 有效期（秒）
+CAPTCHA_POOL_SIZE = int(os.getenv("CAPTCHA_POOL_SIZE", "3"))
+CAPTCHA_WORKERS = int(os.getenv("CAPTCHA_WORKERS", "2"))
+CAPTCHA_TTL = int(os.getenv("CAPTCHA_TTL", "120"))
+# 账号等待预取 ticket 的最长时间（秒）
+CAPTCHA_WAIT = 40
+# 对冲请求：超过历史延迟百分位仍未返回时并行再发一次 1=开启 0=关闭
+CAPTCHA_HEDGE = os.getenv("CAPTCHA_HEDGE", "1") == "1"
+# 触发对冲的延迟百分位、对冲请求占总请求的比例上限
+CAPTCHA_HEDGE_PERCENTILE = float(os.getenv("CAPTCHA_HEDGE_PERCENTILE", "95"))
+CAPTCHA_HEDGE_BUDGET = float(os.getenv("CAPTCHA_HEDGE_BUDGET", "0.2"))
+
+# 会话缓存：保存 Cookie 和 CSRF Token，下次运行校验通过即跳过登录
+SESSION_FILE = os.getenv("RAINYUN_SESSION_FILE", ".rainyun_sessions.json")
+# 会话有效期（秒），默认 7 天
+SESSION_TTL = int(os.getenv("RAINYUN_SESSION_TTL", str(7 * 24 * 3600)))
+
+# 任务列表中 Status 为该值表示今日任务已完成
+TASK_DONE_STATUS = 2
 
 # 账号读取方式：env → file
 ENV_VAR_NAME = "yuyun"
@@ -42,6 +77,367 @@ FILE_NAME     = "yuyun.txt"
 TELEGRAM_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN", "")
 TELEGRAM_CHAT  = os.getenv("TELEGRAM_CHAT_ID", "")
 
+# ------------------------------------------------------------ #
+# ---------- 滑块验证码 -------------------------------- #
+# ------------------------------------------------------------ #
+class LatencyTracker:
+    """按接口记录最近的请求延迟，用于计算百分位"""
+
+    def __init__(self, window: int = 100):
+        self.window = window
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def record(self, endpoint: str, latency: float):
+        with self._lock:
+            self._samples.setdefault(endpoint, deque(maxlen=self.window)).append(latency)
+
+    def percentile(self, endpoint: str, pct: float, min_samples: int = 5):
+        """样本不足时返回 None"""
+        with self._lock:
+            samples = sorted(self._samples.get(endpoint, ()))
+        if len(samples) < min_samples:
+            return None
+        idx = min(len(samples) - 1, int(len(samples) * pct / 100))
+        return samples[idx]
+
+
+class HedgedClient:
+    """对冲请求：主请求超过历史百分位延迟仍未返回时再发一个，取先成功的结果"""
+
+    # 样本不足时使用的默认对冲等待时间（秒）
+    DEFAULT_HEDGE_DELAY = 5.0
+
+    def __init__(self, percentile: float, budget: float, enabled: bool = True):
+        self.percentile = percentile
+        self.budget = budget
+        self.enabled = enabled
+        self.latency = LatencyTracker()
+        self.requests = 0
+        self.hedges_issued = 0
+        self.hedges_won = 0
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="hedge")
+
+    def call(self, func, url: str):
+        """执行 func(url)，失败抛出异常"""
+        endpoint = self._endpoint(url)
+        with self._lock:
+            self.requests += 1
+        primary = self._pool.submit(self._timed, func, url, endpoint)
+        if not self.enabled:
+            return primary.result()
+
+        delay = self.latency.percentile(endpoint, self.percentile) or self.DEFAULT_HEDGE_DELAY
+        done, _ = wait([primary], timeout=delay)
+        if done or not self._take_budget():
+            return primary.result()
+
+        log.info(f"验证码请求超过 {delay:.2f} 秒未返回，发出对冲请求")
+        hedge = self._pool.submit(self._timed, func, url, endpoint)
+        pending = {primary, hedge}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                try:
+                    result = fut.result()
+                except Exception as exc:
+                    error = exc
+                    continue
+                if fut is hedge:
+                    with self._lock:
+                        self.hedges_won += 1
+                return result
+        raise error
+
+    def stats(self, url: str):
+        endpoint = self._endpoint(url)
+        return {
+            "requests": self.requests,
+            "hedges_issued": self.hedges_issued,
+            "hedges_won": self.hedges_won,
+            "p50": self.latency.percentile(endpoint, 50, min_samples=1),
+            f"p{self.percentile:g}": self.latency.percentile(endpoint, self.percentile, min_samples=1),
+        }
+
+    def _take_budget(self) -> bool:
+        with self._lock:
+            if self.hedges_issued + 1 > max(1.0, self.requests * self.budget):
+                return False
+            self.hedges_issued += 1
+            return True
+
+    def _timed(self, func, url, endpoint):
+        start = time.monotonic()
+        result = func(url)
+        self.latency.record(endpoint, time.monotonic() - start)
+        return result
+
+    @staticmethod
+    def _endpoint(url: str) -> str:
+        parts = urlsplit(url)
+        return f"{parts.netloc}{parts.path}"
+
+
+captcha_client = HedgedClient(CAPTCHA_HEDGE_PERCENTILE, CAPTCHA_HEDGE_BUDGET, CAPTCHA_HEDGE)
+
+
+def solve_captcha(url: str = CAPTCHA_URL):
+    """请求验证码服务（必要时发出对冲请求），返回 (ticket, randstr)，失败抛出异常"""
+    return captcha_client.call(_solve_captcha_once, url)
+
+
+def _solve_captcha_once(url: str):
+    """请求一次验证码服务，返回 (ticket, randstr)，失败抛出异常"""
+    resp = requests.get(url, timeout=10)
+    resp.raise_for_status()
+    data = resp.json()
+    if data.get("code") == 200 and data.get("message") == "Success":
+        d = data.get("data", {})
+        ticket, randstr = d.get("ticket"), d.get("randstr")
+        if ticket and randstr:
+            return ticket, randstr
+    raise RuntimeError(f"验证码服务返回异常：{data.get('message')}")
+
+
+class CaptchaPool:
+    """验证码预取池：账号确认需要签到后，后台线程提前获取 ticket 放入有界队列，过期的丢弃重取"""
+
+    def __init__(self, url: str, size: int, workers: int, ttl: int):
+        self.url = url
+        self.ttl = ttl
+        self.workers = workers
+        self._queue = queue.Queue(maxsize=size)
+        self._cond = threading.Condition()
+        self._demand = 0
+        self._started = False
+        self._stop = threading.Event()
+
+    def request(self, count: int = 1):
+        """预取 count 个 ticket，第一次请求时才启动后台线程，所有账号都已签到时不会产生验证码请求"""
+        with self._cond:
+            self._demand += count
+            if not self._started:
+                self._started = True
+                for _ in range(self.workers):
+                    threading.Thread(target=self._worker, daemon=True).start()
+                log.info(f"验证码预取已启动：{self.workers} 个线程，队列容量 {self._queue.maxsize}")
+            self._cond.notify_all()
+
+    def stop(self):
+        self._stop.set()
+        with self._cond:
+            self._cond.notify_all()
+
+    def release(self):
+        """账号申请预取后不再需要 ticket（如中途异常），减少一次预取"""
+        with self._cond:
+            if self._demand > 0:
+                self._demand -= 1
+
+    def get(self, timeout: float = CAPTCHA_WAIT):
+        """阻塞获取一个未过期的 ticket，超时或预取失败返回 (None, None)"""
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                return None, None
+            ticket = self._fresh(item)
+            if ticket:
+                return ticket
+
+    def try_get(self):
+        """非阻塞获取 ticket，队列暂时为空返回 None"""
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return None
+            ticket = self._fresh(item)
+            if ticket:
+                return ticket
+
+    def _fresh(self, item):
+        ticket, randstr, fetched_at = item
+        if ticket and time.monotonic() - fetched_at > self.ttl:
+            log.info("预取的验证码已过期，重新获取")
+            self.request(1)
+            return None
+        return ticket, randstr
+
+    def _take_job(self) -> bool:
+        with self._cond:
+            while self._demand <= 0 and not self._stop.is_set():
+                self._cond.wait()
+            if self._stop.is_set():
+                return False
+            self._demand -= 1
+            return True
+
+    def _worker(self):
+        while self._take_job():
+            # 连续三次失败后放入失败标记，让等待的账号尽快结束
+            item = (None, None, time.monotonic())
+            for i in range(3):
+                try:
+                    ticket, randstr = solve_captcha(self.url)
+                    item = (ticket, randstr, time.monotonic())
+                    break
+                except Exception as exc:
+                    log.warning(f"第 {i+1} 次预取验证码异常：{exc}")
+                    if self._stop.wait(2):
+                        return
+            while not self._stop.is_set():
+                try:
+                    self._queue.put(item, timeout=1)
+                    break
+                except queue.Full:
+                    continue
+
+
+# ------------------------------------------------------------ #
+# ---------- 会话缓存 -------------------------------- #
+# ------------------------------------------------------------ #
+class SessionStore:
+    """按手机号持久化 Cookie 和 CSRF Token 的本地会话缓存"""
+
+    def __init__(self, path: str, ttl: int):
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._entries = self._load()
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+        except Exception as exc:
+            log.warning(f"读取会话缓存失败，忽略：{exc}")
+            return {}
+        now = time.time()
+        valid = {k: v for k, v in entries.items() if now - v.get("saved_at", 0) < self.ttl}
+        self._dirty = len(valid) != len(entries)
+        return valid
+
+    def get(self, phone: str):
+        """返回未过期的会话 {csrf_token, cookies}，没有则返回 None"""
+        with self._lock:
+            entry = self._entries.get(phone)
+            if entry and time.time() - entry.get("saved_at", 0) < self.ttl:
+                return entry
+            return None
+
+    def put(self, phone: str, csrf_token: str, cookie_jar):
+        cookies = [
+            {"name": c.name, "value": c.value, "domain": c.domain, "path": c.path,
+             "expires": c.expires, "secure": c.secure}
+            for c in cookie_jar
+        ]
+        with self._lock:
+            self._entries[phone] = {"saved_at": time.time(), "csrf_token": csrf_token, "cookies": cookies}
+            self._dirty = True
+
+    def discard(self, phone: str):
+        with self._lock:
+            if self._entries.pop(phone, None) is not None:
+                self._dirty = True
+
+    def save(self):
+        """有变化时写回磁盘"""
+        with self._lock:
+            if not self._dirty or not self.path:
+                return
+            tmp_path = f"{self.path}.tmp"
+            try:
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(self._entries, f)
+                os.replace(tmp_path, self.path)
+                self._dirty = False
+                log.info(f"会话缓存已保存：{len(self._entries)} 个账号")
+            except Exception as exc:
+                log.warning(f"保存会话缓存失败：{exc}")
+
+
+# ------------------------------------------------------------ #
+# ---------- 自适应并发 -------------------------------- #
+# ------------------------------------------------------------ #
+class AimdController:
+    """AIMD 并发控制：请求正常时每轮加一，遇到限流、5xx、超时或持续的延迟升高时减半；业务失败（密码错误、已签到等）不影响并发
+
+    延迟按接口分别维护基线（正常请求延迟的指数滑动平均），连续 spike_run 次超过 max(1 秒, 基线 × latency_factor)
+    才算拥塞，单次慢请求不会触发减半。
+    """
+
+    def __init__(self, initial: int, minimum: int, maximum: int, cooldown: float = 2.0,
+                 latency_factor: float = 3.0, spike_run: int = 3):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.limit = float(max(minimum, min(initial, maximum)))
+        self.cooldown = cooldown
+        self.latency_factor = latency_factor
+        self.spike_run = spike_run
+        self.inflight = 0
+        self.peak = int(self.limit)
+        self.decreases = 0
+        self._baseline = {}
+        self._spikes = {}
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+
+    @contextmanager
+    def slot(self):
+        """占用一个并发名额，超过当前上限时等待"""
+        with self._cond:
+            while self.inflight >= int(self.limit):
+                self._cond.wait()
+            self.inflight += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self.inflight -= 1
+                self._cond.notify_all()
+
+    def on_success(self, endpoint: str, latency: float):
+        with self._cond:
+            baseline = self._baseline.get(endpoint)
+            if baseline is not None and latency > max(1.0, baseline * self.latency_factor):
+                # 慢请求不更新基线，也不增加并发；连续多次才减半
+                self._spikes[endpoint] = self._spikes.get(endpoint, 0) + 1
+                if self._spikes[endpoint] >= self.spike_run:
+                    self._spikes[endpoint] = 0
+                    self._decrease(f"接口 {endpoint} 延迟持续升高 {latency:.2f}s（基线 {baseline:.2f}s）")
+                return
+            self._spikes[endpoint] = 0
+            self._baseline[endpoint] = latency if baseline is None else baseline * 0.8 + latency * 0.2
+            self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self.peak = max(self.peak, int(self.limit))
+            self._cond.notify_all()
+
+    def on_congestion(self, reason: str):
+        with self._cond:
+            self._decrease(reason)
+
+    def summary(self) -> str:
+        return f"当前 {int(self.limit)}，峰值 {self.peak}，减半 {self.decreases} 次"
+
+    def _decrease(self, reason: str):
+        # 冷却期内只减一次，避免同一波错误把并发压到底
+        now = time.monotonic()
+        if now - self._last_decrease < self.cooldown:
+            return
+        self._last_decrease = now
+        old = self.limit
+        self.limit = max(float(self.minimum), self.limit / 2)
+        self.decreases += 1
+        log.warning(f"检测到{reason}，并发 {old:.1f} → {self.limit:.1f}")
+
+
 # ------------------------------------------------------------ #
 # ---------- 单账号处理类 -------------------------------- #
 # ------------------------------------------------------------ #
@@ -64,6 +460,11 @@ class RainyunAccount:
             }
         )
         self.csrf_token = None
+        self.captcha_pool = None
+        self._ticket_requested = False
+        self._ticket_taken = False
+        self.feedback = None
+        self.session_store = None
 
     # -------------------------------------- #
     # ------------- 业务实现 ----------------#
@@ -72,48 +473,87 @@ class RainyunAccount:
         """完成一整套业务流程，返回 (成功, 结果消息, 积分, 位置)"""
         try:
             log.info(f"[{self.idx:02d}] 开始签到任务")
-            if not self._login():
+            restored = self._restore_session()
+            if not restored and not self._login():
                 return False, "登录失败", None, None
+
+            user_info = self._get_user_info()
+            if not user_info and restored:
+                if not self._relogin():
+                    return False, "登录失败", None, None
+                user_info = self._get_user_info()
+            if not user_info:
+                return False, "获取用户信息失败", None, None
+
+            # 已完成签到任务的账号直接返回，不再延迟和请求验证码
+            if self._task_done():
+                return self._summarize(True, None, user_info, None, already_done=True)
+            # 确认需要签到后才开始预取，与随机延迟并行
+            self._prefetch_ticket()
             self._random_delay()
 
+            # 签到前才取 ticket，保证预取的 ticket 尽量新鲜
             ticket, rand = self._get_slide_verify()
             if not ticket:
                 return False, "滑块验证码获取失败", None, None
 
             self._log("滑块验证码获取成功")
 
-            user_info = self._get_user_info()
-            if not user_info:
-                return False, "获取用户信息失败", None, None
-
             ok, msg = self._sign_in(ticket, rand)
-            if ok:
-                msg = "签到成功"
-            else:
-                msg = f"签到错误：{msg}"
 
             # 再次拉取积分
             new_info = self._get_user_info()
-            points = new_info["points"] if new_info else user_info["points"]
-            
-            # 格式化位置信息
-            last_login_area = new_info.get('lastLoginArea', user_info.get('lastLoginArea', '未知'))
-            last_ip = new_info.get('lastIP', user_info.get('lastIP', '未知'))
-            location = f"{last_login_area} ({last_ip})"
-
-            summary = f"""
-⚡  签到状态：{msg}
-💰  当前积分：{points}
-🏠  最后登录地点：{location}
-"""
-            self._log(summary.strip())
+            return self._summarize(ok, msg, user_info, new_info)
+
+        except Exception as exc:
+            log.error(f"[{self.idx:02d}] 任务异常：{exc}")
+            log.debug(traceback.format_exc())
+            return False, str(exc), None, None
+        finally:
+            self._release_ticket()
+
+    async def run_async(self, limiter: asyncio.Semaphore):
+        """异步版本的业务流程，等待期间不占用线程，网络请求受 limiter 限制"""
+        try:
+            log.info(f"[{self.idx:02d}] 开始签到任务")
+            restored = self._restore_session()
+            if not restored and not await self._in_thread(limiter, self._login):
+                return False, "登录失败", None, None
+
+            user_info = await self._in_thread(limiter, self._get_user_info)
+            if not user_info and restored:
+                if not await self._in_thread(limiter, self._relogin):
+                    return False, "登录失败", None, None
+                user_info = await self._in_thread(limiter, self._get_user_info)
+            if not user_info:
+                return False, "获取用户信息失败", None, None
 
-            return True, msg, points, location
+            # 已完成签到任务的账号直接返回，不再延迟和请求验证码
+            if await self._in_thread(limiter, self._task_done):
+                return self._summarize(True, None, user_info, None, already_done=True)
+            # 确认需要签到后才开始预取，与随机延迟并行
+            self._prefetch_ticket()
+            await asyncio.sleep(self._pick_delay())
+
+            # 签到前才取 ticket，保证预取的 ticket 尽量新鲜
+            ticket, rand = await self._get_slide_verify_async(limiter)
+            if not ticket:
+                return False, "滑块验证码获取失败", None, None
+
+            self._log("滑块验证码获取成功")
+
+            ok, msg = await self._in_thread(limiter, self._sign_in, ticket, rand)
+
+            # 再次拉取积分
+            new_info = await self._in_thread(limiter, self._get_user_info)
+            return self._summarize(ok, msg, user_info, new_info)
 
         except Exception as exc:
             log.error(f"[{self.idx:02d}] 任务异常：{exc}")
             log.debug(traceback.format_exc())
             return False, str(exc), None, None
+        finally:
+            self._release_ticket()
 
     # -------------------------------------- #
     # ------------ 具体实现 ----------------#
@@ -123,15 +563,96 @@ class RainyunAccount:
         prefix = f"[{self.idx:02d}] {self.phone[:4]}****{self.phone[7:]}"
         log.info(f"{prefix} {msg}")
 
-    def _random_delay(self):
+    @staticmethod
+    async def _in_thread(limiter, func, *args):
+        """在线程中执行阻塞请求，limiter 限制同时进行的请求数"""
+        async with limiter:
+            return await asyncio.to_thread(func, *args)
+
+    def _summarize(self, ok, msg, user_info, new_info, already_done=False):
+        """汇总签到结果，返回 (成功, 结果消息, 积分, 位置)"""
+        if already_done:
+            msg = "今日已签到"
+        elif ok:
+            msg = "签到成功"
+        else:
+            msg = f"签到错误：{msg}"
+
+        new_info = new_info or {}
+        points = new_info.get("points", user_info["points"])
+
+        # 格式化位置信息
+        last_login_area = new_info.get('lastLoginArea', user_info.get('lastLoginArea', '未知'))
+        last_ip = new_info.get('lastIP', user_info.get('lastIP', '未知'))
+        location = f"{last_login_area} ({last_ip})"
+
+        summary = f"""
+⚡  签到状态：{msg}
+💰  当前积分：{points}
+🏠  最后登录地点：{location}
+"""
+        self._log(summary.strip())
+
+        return True, msg, points, location
+
+    def _pick_delay(self):
         delay = random.randint(10, 20)
         self._log(f"随机延迟 {delay} 秒")
-        time.sleep(delay)
+        return delay
+
+    def _random_delay(self):
+        time.sleep(self._pick_delay())
+
+    def _api(self, method: str, url: str, **kwargs):
+        """请求雨云 API，并把限流、超时、5xx 和延迟反馈给自适应并发控制器"""
+        start = time.monotonic()
+        try:
+            resp = self.session.request(method, url, **kwargs)
+        except (requests.Timeout, requests.ConnectionError) as exc:
+            if self.feedback:
+                self.feedback.on_congestion(f"请求超时/连接失败（{exc.__class__.__name__}）")
+            raise
+        if self.feedback:
+            try:
+                code = resp.json().get("code", resp.status_code)
+            except Exception:
+                code = resp.status_code
+            if resp.status_code == 429 or resp.status_code >= 500 or code == 429:
+                self.feedback.on_congestion(f"HTTP {resp.status_code}" if code != 429 else "限流")
+            else:
+                # 其他业务码（密码错误、已签到、验证码未通过等）与并发无关，只记录延迟
+                self.feedback.on_success(urlsplit(url).path, time.monotonic() - start)
+        return resp
+
+    def _restore_session(self) -> bool:
+        """从会话缓存恢复 Cookie 和 CSRF Token"""
+        if not self.session_store:
+            return False
+        entry = self.session_store.get(self.phone)
+        if not entry or not entry.get("csrf_token"):
+            return False
+        for c in entry["cookies"]:
+            self.session.cookies.set(
+                c["name"], c["value"], domain=c.get("domain"), path=c.get("path", "/"),
+                expires=c.get("expires"), secure=c.get("secure", False),
+            )
+        self.csrf_token = entry["csrf_token"]
+        self._log("已从缓存恢复会话，跳过登录")
+        return True
+
+    def _relogin(self) -> bool:
+        """缓存会话失效时清除并重新登录"""
+        self._log("缓存会话已失效，重新登录")
+        self.session_store.discard(self.phone)
+        self.session.cookies.clear()
+        self.csrf_token = None
+        return self._login()
 
     def _login(self) -> bool:
         """登录，提取 CSRF Token"""
         try:
-            resp = self.session.post(
+            resp = self._api(
+                "POST",
                 "https://api.v2.rainyun.com/user/login",
                 json={"field": self.phone, "password": self.password},
                 timeout=10,
@@ -148,39 +669,78 @@ class RainyunAccount:
             return False
         self.csrf_token = cookie
         self._log(f"提取 CSRF Token：{cookie[:8]}...")
+        if self.session_store:
+            self.session_store.put(self.phone, self.csrf_token, self.session.cookies)
         return True
 
     def _get_slide_verify(self):
-        """调用外部滑块验证码服务"""
-        url = "https://txdx.vvvcx.me/solve_captcha?aid=2039519451&type=1"
+        """调用外部滑块验证码服务，开启预取时从预取池领取"""
+        if self.captcha_pool:
+            self._ticket_taken = True
+            return self.captcha_pool.get()
         for i in range(3):
-            try:
-                resp = requests.get(url, timeout=10)
-                resp.raise_for_status()
-                data = resp.json()
-                if data.get("code") == 200 and data.get("message") == "Success":
-                    d = data.get("data", {})
-                    ticket, randstr = d.get("ticket"), d.get("randstr")
-                    if ticket and randstr:
-                        return ticket, randstr
-            except Exception as exc:
-                self._log(f"第 {i+1} 次校验请求异常：{exc}")
+            ticket, randstr = self._try_slide_verify(i)
+            if ticket:
+                return ticket, randstr
             time.sleep(2)
         return None, None
 
+    async def _get_slide_verify_async(self, limiter):
+        """异步获取验证码，等待期间不占用线程"""
+        if self.captcha_pool:
+            self._ticket_taken = True
+            deadline = time.monotonic() + CAPTCHA_WAIT
+            while time.monotonic() < deadline:
+                ticket = self.captcha_pool.try_get()
+                if ticket:
+                    return ticket
+                await asyncio.sleep(0.2)
+            return None, None
+        for i in range(3):
+            ticket, randstr = await self._in_thread(limiter, self._try_slide_verify, i)
+            if ticket:
+                return ticket, randstr
+            await asyncio.sleep(2)
+        return None, None
+
+    def _try_slide_verify(self, i):
+        """单次请求滑块验证码服务，失败返回 (None, None)"""
+        try:
+            return solve_captcha()
+        except Exception as exc:
+            self._log(f"第 {i+1} 次校验请求异常：{exc}")
+        return None, None
+
+    def _prefetch_ticket(self):
+        """通知预取池为本账号准备一个 ticket"""
+        if self.captcha_pool:
+            self._ticket_requested = True
+            self.captcha_pool.request()
+
+    def _release_ticket(self):
+        """申请预取后流程提前结束时归还名额，避免多余的验证码请求"""
+        if self.captcha_pool and self._ticket_requested and not self._ticket_taken:
+            self._ticket_taken = True
+            self.captcha_pool.release()
+
     def _get_user_info(self):
         """获取用户信息"""
         if not self.csrf_token:
             self._log("CSRF Token 为空，无法获取用户信息")
             return None
         try:
-            resp = self.session.get(
+            resp = self._api(
+                "GET",
                 "https://api.v2.rainyun.com/user/?no_cache=false",
                 headers={"x-csrf-token": self.csrf_token, "Content-Type": "application/json"},
                 timeout=10,
             )
             resp.raise_for_status()
-            data = resp.json().get("data", {})
+            body = resp.json()
+            if body.get("code", 200) != 200:
+                self._log(f"获取用户信息失败：{body.get('message', body.get('code'))}")
+                return None
+            data = body.get("data", {})
             return {
                 "name": data.get("Name"),
                 "email": data.get("Email"),
@@ -192,10 +752,33 @@ class RainyunAccount:
             self._log(f"获取用户信息异常：{exc}")
             return None
 
+    def _task_done(self) -> bool:
+        """查询签到任务状态，今日已完成返回 True，查询失败按未完成处理"""
+        try:
+            resp = self._api(
+                "GET",
+                "https://api.v2.rainyun.com/user/reward/tasks",
+                headers={"x-csrf-token": self.csrf_token, "Content-Type": "application/json"},
+                timeout=10,
+            )
+            resp.raise_for_status()
+            tasks = resp.json().get("data") or []
+        except Exception as exc:
+            self._log(f"查询任务状态异常：{exc}")
+            return False
+        for task in tasks:
+            if task.get("Name") == "每日签到":
+                done = task.get("Status") == TASK_DONE_STATUS
+                if done:
+                    self._log("今日签到任务已完成，跳过验证码")
+                return done
+        return False
+
     def _sign_in(self, ticket, randstr):
         """签到接口"""
         try:
-            resp = self.session.post(
+            resp = self._api(
+                "POST",
                 "https://api.v2.rainyun.com/user/reward/tasks",
                 headers={
                     "x-csrf-token": self.csrf_token,
@@ -237,6 +820,23 @@ def load_accounts():
     return [RainyunAccount(line, idx + 1) for idx, line in enumerate(lines)]
 
 
+async def run_async_all(accounts, max_requests):
+    """异步执行所有账号，随机延迟互相重叠，结果保持账号顺序"""
+    loop = asyncio.get_running_loop()
+    loop.set_default_executor(ThreadPoolExecutor(max_workers=max_requests))
+    limiter = asyncio.Semaphore(max_requests)
+
+    async def run_one(ac):
+        try:
+            ok, msg, points, location = await ac.run_async(limiter)
+        except Exception as exc:
+            ok, msg, points, location = False, f"异常：{exc}", None, None
+        log.info(f"[{ac.idx:02d}] {ac.phone[:4]}****{ac.phone[7:]} => {msg} ({'✅' if ok else '❌'})")
+        return ac.phone, ok, msg, points, location
+
+    return list(await asyncio.gather(*(run_one(ac) for ac in accounts)))
+
+
 def main():
     try:
         accounts = load_accounts()
@@ -244,11 +844,40 @@ def main():
         log.error(f"账号读取异常：{exc}")
         sys.exit(1)
 
-    if MODE == 2:
-        log.info(f"并发执行，最大 {RUN_MAX} 个线程")
+    session_store = SessionStore(SESSION_FILE, SESSION_TTL)
+    for ac in accounts:
+        ac.session_store = session_store
+
+    captcha_pool = None
+    if CAPTCHA_PREFETCH:
+        # 每个账号确认今日未签到后才申请预取，全部已签到时不会请求验证码
+        captcha_pool = CaptchaPool(CAPTCHA_URL, CAPTCHA_POOL_SIZE, CAPTCHA_WORKERS, CAPTCHA_TTL)
+        for ac in accounts:
+            ac.captcha_pool = captcha_pool
+
+    if MODE == 3:
+        log.info(f"异步执行，最多 {RUN_MAX} 个请求同时进行")
+        results = asyncio.run(run_async_all(accounts, RUN_MAX))
+    elif MODE == 2:
         results = []
-        with ThreadPoolExecutor(max_workers=RUN_MAX) as pool:
-            futures = {pool.submit(ac.run): ac for ac in accounts}
+        controller = None
+        if ADAPTIVE:
+            controller = AimdController(RUN_MAX, 1, max(RUN_MAX, RUN_MAX_LIMIT))
+            log.info(f"自适应并发执行，初始 {RUN_MAX} 个线程，上限 {controller.maximum}")
+            for ac in accounts:
+                ac.feedback = controller
+        else:
+            log.info(f"并发执行，最大 {RUN_MAX} 个线程")
+
+        def run_account(ac):
+            if not controller:
+                return ac.run()
+            with controller.slot():
+                return ac.run()
+
+        workers = controller.maximum if controller else RUN_MAX
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(run_account, ac): ac for ac in accounts}
             for fut in as_completed(futures):
                 ac = futures[fut]
                 try:
@@ -257,6 +886,8 @@ def main():
                     ok, msg, points, location = False, f"异常：{exc}", None, None
                 results.append((ac.phone, ok, msg, points, location))
                 log.info(f"[{ac.idx:02d}] {ac.phone[:4]}****{ac.phone[7:]} => {msg} ({'✅' if ok else '❌'})")
+        if controller:
+            log.info(f"自适应并发结果：{controller.summary()}")
     else:
         log.info("顺序执行")
         results = []
@@ -265,6 +896,16 @@ def main():
             results.append((ac.phone, ok, msg, points, location))
             log.info(f"[{ac.idx:02d}] {ac.phone[:4]}****{ac.phone[7:]} => {msg} ({'✅' if ok else '❌'})")
 
+    if captcha_pool:
+        captcha_pool.stop()
+    session_store.save()
+
+    stats = captcha_client.stats(CAPTCHA_URL)
+    log.info(
+        f"验证码请求 {stats['requests']} 次，对冲发出 {stats['hedges_issued']} 次，"
+        f"对冲胜出 {stats['hedges_won']} 次，延迟统计：{stats}"
+    )
+
     # 发送 Telegram 推送
     if TELEGRAM_TOKEN and TELEGRAM_CHAT:
         try: